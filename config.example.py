@@ -3,8 +3,21 @@ Configuration template - copy to config.py and fill in your values.
 DO NOT commit config.py to git.
 """
 
+import atexit
 import pyodbc
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from security import MAX_JSON_CONTENT_LENGTH
+
+def _server_and_database(db_type):
+    """Return (server, database) for db_type: 'source' or 'reporting'"""
+    if db_type == 'source':
+        return 'YOUR_SOURCE_SERVER', 'YOUR_SOURCE_DB'
+    elif db_type == 'reporting':
+        return 'YOUR_REPORTING_SERVER', 'YOUR_REPORTING_DB'
+    else:
+        raise ValueError(f"Unknown db_type: {db_type}")
 
 def connect_to_database(db_type):
     """
@@ -12,14 +25,7 @@ def connect_to_database(db_type):
     
     db_type: 'source' or 'reporting'
     """
-    if db_type == 'source':
-        server = 'YOUR_SOURCE_SERVER'
-        database = 'YOUR_SOURCE_DB'
-    elif db_type == 'reporting':
-        server = 'YOUR_REPORTING_SERVER'
-        database = 'YOUR_REPORTING_DB'
-    else:
-        raise ValueError(f"Unknown db_type: {db_type}")
+    server, database = _server_and_database(db_type)
     
     conn_str = (
         f"Driver={{ODBC Driver 17 for SQL Server}};"
@@ -28,7 +34,33 @@ def connect_to_database(db_type):
         f"Trusted_Connection=yes;"
     )
     
-    return pyodbc.connect(conn_str)
+    # Statements commit individually unless wrapped in database.transaction()
+    return pyodbc.connect(conn_str, autocommit=True)
+
+def connect_fast_fetch(db_type):
+    """
+    Optional read-only turbodbc connection for --fast-fetch.
+    Requires: pip install turbodbc pyarrow
+    """
+    import turbodbc
+    
+    server, database = _server_and_database(db_type)
+    
+    options = turbodbc.make_options(
+        use_async_io=True,  # Fetch the next batch while the current one is processed
+        prefer_unicode=True,
+        # NVARCHAR(MAX) values longer than this are truncated. One character over the
+        # payload limit, so oversized documents fail validate_payload_size, not the parser.
+        varchar_max_character_limit=MAX_JSON_CONTENT_LENGTH + 1,
+        read_buffer_size=turbodbc.Megabytes(64),
+    )
+    return turbodbc.connect(
+        driver='ODBC Driver 17 for SQL Server',
+        server=server,
+        database=database,
+        trusted_connection='yes',
+        turbodbc_options=options,
+    )
 
 # Configure logging
 logging.basicConfig(
@@ -36,5 +68,12 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
-# Audit logger
-audit_logger = logging.getLogger('audit')
\ No newline at end of file
+# Audit logger - records are written by a background thread, off the ETL path
+audit_logger = logging.getLogger('audit')
+audit_queue = queue.SimpleQueue()
+audit_logger.addHandler(QueueHandler(audit_queue))
+audit_logger.propagate = False
+audit_listener = QueueListener(audit_queue, *logging.getLogger().handlers,
+                               respect_handler_level=True)
+audit_listener.start()
+atexit.register(audit_listener.stop)
\ No newline at end of file
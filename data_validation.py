@@ -1,8 +1,22 @@
 import logging
 from datetime import datetime
+from itertools import chain, count
 from typing import Optional, Any
 
 
+# PERFORMANCE: Warnings below use lazy %-formatting behind isEnabledFor, so
+# bad values cost nothing extra when WARNING is disabled
+_log = logging.getLogger(__name__)
+
+# (store key, qty key) pairs starting at SDQ03/SDQ04, built once at import.
+# Pairs past SDQ99 are generated on demand.
+_SDQ_KEY_PAIRS = tuple((f'SDQ{i:02d}', f'SDQ{i + 1:02d}') for i in range(3, 99, 2))
+
+# SECURITY: Upper bounds for converted values
+MAX_QUANTITY = 1000000
+MAX_PRICE = 1000000.0
+
+
 def safe_parse_date(date_string: Optional[str]) -> Optional[datetime]:
     """
     Safely parse date strings with validation.
@@ -14,52 +28,72 @@ def safe_parse_date(date_string: Optional[str]) -> Optional[datetime]:
     try:
         # Expected format: YYYYMMDD
         if len(date_string) != 8:
-            logging.warning(f"Invalid date format length: {date_string}")
+            if _log.isEnabledFor(logging.WARNING):
+                _log.warning("Invalid date format length: %s", date_string)
             return None
 
-        year = int(date_string[0:4])
-        month = int(date_string[4:6])
-        day = int(date_string[6:8])
+        # Parse all eight digits at once rather than three int() calls on slices
+        if not (date_string.isascii() and date_string.isdigit()):
+            raise ValueError("non-digit characters")
+        year, month_day = divmod(int(date_string), 10000)
+        month, day = divmod(month_day, 100)
 
         # SECURITY: Validate reasonable date ranges
         if year < 2000 or year > 2100:
-            logging.warning(f"Date year out of range: {year}")
+            if _log.isEnabledFor(logging.WARNING):
+                _log.warning("Date year out of range: %d", year)
             return None
 
         return datetime(year, month, day)
     except (ValueError, TypeError) as e:
-        logging.warning(f"Date parsing failed for '{date_string}': {type(e).__name__}")
+        if _log.isEnabledFor(logging.WARNING):
+            _log.warning("Date parsing failed for '%s': %s", date_string, type(e).__name__)
         return None
 
 
 def safe_int_conversion(value: Any, default: int = 0) -> int:
     """
     SECURITY: Safely convert values to integers with validation.
+    PERFORMANCE: JSON integers skip the conversion and its try/except.
     """
-    try:
-        result = int(value)
-        # SECURITY: Sanity check for reasonable quantities
-        if result < 0 or result > 1000000:
-            logging.warning(f"Suspicious quantity value: {result}")
+    if type(value) is int:
+        result = value
+    else:
+        try:
+            result = int(value)
+        except (ValueError, TypeError):
             return default
-        return result
-    except (ValueError, TypeError):
+
+    # SECURITY: Sanity check for reasonable quantities
+    if result < 0 or result > MAX_QUANTITY:
+        if _log.isEnabledFor(logging.WARNING):
+            _log.warning("Suspicious quantity value: %s", result)
         return default
+    return result
 
 
 def safe_float_conversion(value: Any, default: float = 0.0) -> float:
     """
     SECURITY: Safely convert values to floats with validation.
+    PERFORMANCE: JSON numbers skip the try/except.
     """
-    try:
+    value_type = type(value)
+    if value_type is float:
+        result = value
+    elif value_type is int:
         result = float(value)
-        # SECURITY: Sanity check for reasonable prices
-        if result < 0 or result > 1000000:
-            logging.warning(f"Suspicious price value: {result}")
+    else:
+        try:
+            result = float(value)
+        except (ValueError, TypeError):
             return default
-        return result
-    except (ValueError, TypeError):
+
+    # SECURITY: Sanity check for reasonable prices
+    if result < 0 or result > MAX_PRICE:
+        if _log.isEnabledFor(logging.WARNING):
+            _log.warning("Suspicious price value: %s", result)
         return default
+    return result
 
 
 def parse_destination_dc(destination_info):
@@ -89,12 +123,9 @@ def parse_store_allocations(destination_info):
     sdq = destination_info['SDQ']
     allocations = []
 
-    # Start at SDQ03 (index 3), process pairs: store at odd index, qty at even index
-    i = 3
-    while True:
-        store_key = f'SDQ{i:02d}'
-        qty_key = f'SDQ{i+1:02d}'
-
+    # Start at SDQ03, process pairs: store at odd index, qty at even index
+    key_pairs = chain(_SDQ_KEY_PAIRS, ((f'SDQ{i}', f'SDQ{i + 1}') for i in count(99, 2)))
+    for store_key, qty_key in key_pairs:
         # Check if both keys exist
         if store_key not in sdq or qty_key not in sdq:
             break
@@ -105,6 +136,4 @@ def parse_store_allocations(destination_info):
         if store_number and qty > 0:
             allocations.append((store_number, qty))
 
-        i += 2  # Move to next pair
-
     return allocations
\ No newline at end of file
@@ -1,7 +1,235 @@
 import logging
-from typing import Optional, List
+import queue
+import threading
+from typing import Optional, List, Iterator, NamedTuple
 from contextlib import contextmanager
-from staging import get_table_name
+
+
+# Rows per cursor.executemany() call for bulk inserts
+EXECUTEMANY_BATCH_SIZE = 1000
+
+# IDs reserved per sequence round-trip
+ID_BLOCK_SIZE = 1000
+
+# Rows (headers, details and BOM components) buffered by ReportRowBuffer per flush
+BULK_FLUSH_ROWS = 50000
+
+
+class ReportRows(NamedTuple):
+    """
+    Reporting rows for one EDI record, in table column order.
+
+    header: (CustomerPO, Company, OrderDate, StartDate, CompleteDate, Department,
+             DownloadDate, POType, Version, SourceTableId)
+    details: detail rows without HeaderId (see insert_details)
+    detail_components: BOM component rows without DetailId, one list per detail
+                       row, or None when the details have no BOM components
+    """
+    header: tuple
+    details: List[tuple]
+    detail_components: Optional[List[List[tuple]]] = None
+
+
+class ConnectionPool:
+    """
+    Bounded pool of database connections shared across ETL work.
+    PERFORMANCE: Reuses open connections instead of paying the connect/auth
+    handshake on every use.
+
+    Usage:
+        pool = ConnectionPool(lambda: connect_to_database('reporting'))
+        with pool.acquire() as db_connection:
+            execute_query(db_connection, "SELECT ...")
+        pool.close()
+    """
+
+    def __init__(self, connect, min_size: int = 2, max_size: int = 10):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min_size={min_size}, max_size={max_size}")
+
+        self._connect = connect
+        self._max_size = max_size
+        self._idle = queue.LifoQueue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self._created = 0
+
+        for _ in range(min_size):
+            self._idle.put(self._open_connection())
+
+    def _open_connection(self):
+        """Open a new connection if the pool has room, else return None"""
+        with self._lock:
+            if self._created >= self._max_size:
+                return None
+            self._created += 1
+
+        try:
+            return self._connect()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def _discard(self, connection):
+        """Close a connection and free its slot in the pool"""
+        with self._lock:
+            self._created -= 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _is_alive(connection) -> bool:
+        """Validate a pooled connection before handing it out"""
+        try:
+            cursor = connection.cursor()
+            try:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+            finally:
+                cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _checkout(self, timeout: Optional[float]):
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                connection = self._open_connection()
+                if connection is not None:
+                    return connection
+                try:
+                    connection = self._idle.get(timeout=timeout)
+                except queue.Empty:
+                    raise TimeoutError("No database connection available in pool")
+
+            if self._is_alive(connection):
+                return connection
+
+            logging.warning("Discarding broken pooled connection")
+            self._discard(connection)
+
+    @contextmanager
+    def acquire(self, timeout: Optional[float] = None):
+        """
+        Borrow a validated connection, returning it to the pool on exit.
+        Blocks until one is free if max_size connections are in use.
+        """
+        connection = self._checkout(timeout)
+        try:
+            yield connection
+        finally:
+            self._idle.put(connection)
+
+    def close(self):
+        """Close all idle connections"""
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(connection)
+
+
+class IdAllocator:
+    """
+    Hands out IDs from a SQL Server sequence, reserving them a block at a time.
+    PERFORMANCE: Inserts carry client-assigned IDs, so they can be batched
+    without waiting on OUTPUT INSERTED.Id.
+    Unused IDs left in a block are skipped; sequences allow gaps.
+    """
+
+    def __init__(self, sequence_name: str, block_size: int = ID_BLOCK_SIZE):
+        self._sequence_name = sequence_name
+        self._block_size = block_size
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0
+
+    def take(self, count: int, db_connection) -> range:
+        """Return count consecutive IDs, reserving a new block if needed"""
+        with self._lock:
+            if self._end - self._next < count:
+                block = reserve_ids(db_connection, self._sequence_name,
+                                    max(count, self._block_size))
+                self._next, self._end = block.start, block.stop
+
+            ids = range(self._next, self._next + count)
+            self._next += count
+            return ids
+
+
+# Shared by all connections; the sequences serve staging and production tables
+HEADER_IDS = IdAllocator('EDI_Report_Header_Seq')
+DETAIL_IDS = IdAllocator('EDI_Report_Detail_Seq')
+
+
+# Production report tables by role; staging.resolve_table_names() maps the
+# same roles to the staging copies during reprocess-all
+REPORT_TABLES = {
+    'header': 'EDI_Report_Header',
+    'detail': 'EDI_Report_Detail',
+    'bom': 'EDI_Report_BOM_Component',
+}
+
+# Statements against the report tables, keyed by name: (table role, SQL template)
+# INSERT templates also get a '_tablock' variant that takes one table lock instead of
+# row locks, for writers that own the table (see ReportRowBuffer)
+_REPORT_QUERY_TEMPLATES = {
+    'insert_header': ('header', """
+        INSERT INTO {table}{hint} (
+            Id, CustomerPO, Company, OrderDate, StartDate, CompleteDate,
+            Department, DownloadDate, POType, Version, SourceTableId, ProcessedDate
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, GETDATE())
+    """),
+    'insert_details': ('detail', """
+        INSERT INTO {table}{hint} (
+            Id, HeaderId, Style, Color, Size, Qty, UPC, SKU, UOM,
+            UnitPrice, RetailPrice, InnerPack, QtyPerInnerPack,
+            DC, StoreNumber, IsBOM
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """),
+    'insert_bom_components': ('bom', """
+        INSERT INTO {table}{hint} (
+            DetailId, ComponentSKU, ComponentSize, ComponentQty,
+            ComponentUnitPrice, ComponentRetailPrice
+        )
+        VALUES (?, ?, ?, ?, ?, ?)
+    """),
+    'next_version': ('header', """
+        SELECT COUNT(*) + 1 AS NextVersion
+        FROM {table}
+        WHERE CustomerPO = ?
+        AND DownloadDate < ?
+    """),
+}
+
+# SQL for the current table mode (production or staging)
+_QUERY_CACHE = {}
+
+
+def refresh_query_cache(tables: Optional[dict] = None):
+    """
+    Build the report-table SQL for the given {role: table name} mapping
+    (production tables by default).
+    PERFORMANCE: Queries are built once per mode switch, not once per insert.
+    SAFETY: Called by swap_to_staging_mode() and reset_staging_mode().
+    """
+    if tables is None:
+        tables = REPORT_TABLES
+    for name, (table_key, template) in _REPORT_QUERY_TEMPLATES.items():
+        table = tables[table_key]
+        _QUERY_CACHE[name] = template.format(table=table, hint='')
+        if name.startswith('insert_'):
+            _QUERY_CACHE[f'{name}_tablock'] = template.format(table=table, hint=' WITH (TABLOCK)')
+
+
+refresh_query_cache()
 
 
 @contextmanager
@@ -31,13 +259,11 @@ def transaction(connection):
         connection.autocommit = original_autocommit
 
 
-def execute_query(connection, query: str, params: Optional[List] = None):
+@contextmanager
+def _executed_cursor(connection, query: str, params: Optional[List] = None):
     """
-    Execute parameterized query - SECURITY: Always use parameters.
-
-    Commit behavior:
-    - If connection.autocommit is True (default): commits after each query
-    - If connection.autocommit is False (inside transaction): skips commit
+    Execute parameterized query and yield the cursor; closes it on exit.
+    SECURITY: Errors are logged without the query or parameters.
     """
     cursor = connection.cursor()
     try:
@@ -45,23 +271,7 @@ def execute_query(connection, query: str, params: Optional[List] = None):
             cursor.execute(query, params)
         else:
             cursor.execute(query)
-
-        # Return results for SELECT queries
-        if query.strip().upper().startswith('SELECT'):
-            columns = [column[0] for column in cursor.description]
-            results = []
-            for row in cursor.fetchall():
-                results.append(dict(zip(columns, row)))
-            return results
-        else:
-            # Only commit if autocommit is enabled (not inside a transaction block)
-            if connection.autocommit:
-                connection.commit()
-            # For INSERT with OUTPUT, return the generated ID
-            if 'OUTPUT INSERTED.Id' in query.upper():
-                row = cursor.fetchone()
-                return [{'Id': row[0]}] if row else []
-            return []
+        yield cursor
     except Exception as e:
         # Only rollback if we're in autocommit mode (transaction() handles its own rollback)
         if connection.autocommit:
@@ -73,83 +283,275 @@ def execute_query(connection, query: str, params: Optional[List] = None):
         cursor.close()
 
 
-def insert_header(customer_po, company, order_date, start_date, complete_date,
+def execute_select(connection, query: str, params: Optional[List] = None) -> List[dict]:
+    """Execute parameterized SELECT and return all rows as dicts"""
+    with _executed_cursor(connection, query, params) as cursor:
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def execute_dml(connection, query: str, params: Optional[List] = None) -> None:
+    """
+    Execute parameterized INSERT/UPDATE/DELETE or DDL with no result set.
+    PERFORMANCE: No result description or row dicts are built.
+    """
+    with _executed_cursor(connection, query, params):
+        pass
+
+
+def execute_batch(connection, sql: str) -> None:
+    """
+    Execute a multi-statement T-SQL batch (DDL or DML, no parameters) in one round-trip.
+    Every result set is consumed so errors from later statements are raised.
+    """
+    with _executed_cursor(connection, sql) as cursor:
+        while cursor.nextset():
+            pass
+
+
+def execute_query(connection, query: str, params: Optional[List] = None):
+    """
+    Execute parameterized query - SECURITY: Always use parameters.
+    Prefer execute_select / execute_dml when the statement type is known.
+
+    Commit behavior:
+    - If connection.autocommit is True (default): the server commits each statement
+    - If connection.autocommit is False (inside transaction): the caller commits
+    """
+    # Return results for SELECT queries, and the generated ID for INSERT with OUTPUT
+    query_upper = query.upper()
+    if query_upper.strip().startswith('SELECT') or 'OUTPUT INSERTED.ID' in query_upper:
+        return execute_select(connection, query, params)
+
+    execute_dml(connection, query, params)
+    return []
+
+
+def execute_scalar(connection, query: str, params: Optional[List] = None):
+    """
+    Execute parameterized query and return the first column of the first row.
+    Statements before the first result set (SET, DECLARE, EXEC) are skipped.
+    """
+    with _executed_cursor(connection, query, params) as cursor:
+        while cursor.description is None:
+            if not cursor.nextset():
+                return None
+
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+
+def reserve_ids(db_connection, sequence_name: str, count: int) -> range:
+    """
+    Reserve a contiguous range of count values from a sequence in one round-trip.
+    SECURITY: Uses parameterized query.
+    """
+    query = """
+        SET NOCOUNT ON;
+        DECLARE @first_value SQL_VARIANT;
+        EXEC sp_sequence_get_range
+            @sequence_name = ?,
+            @range_size = ?,
+            @range_first_value = @first_value OUTPUT;
+        SELECT CAST(@first_value AS INT) AS FirstId;
+    """
+    first_id = execute_scalar(db_connection, query, [sequence_name, count])
+    return range(first_id, first_id + count)
+
+
+def insert_header(header_id, customer_po, company, order_date, start_date, complete_date,
                  department, download_date, po_type, version, source_table_id,
                  db_connection):
     """
     Insert header record with versioning.
+    header_id comes from HEADER_IDS (EDI_Report_Header_Seq).
     SECURITY: Uses parameterized query.
     SAFETY: Writes to staging table if in reprocess-all mode.
     """
-    table_name = get_table_name('EDI_Report_Header')
+    execute_dml(db_connection, _QUERY_CACHE['insert_header'], [
+        header_id, customer_po, company, order_date, start_date, complete_date,
+        department, download_date, po_type, version, source_table_id
+    ])
 
-    query = f"""
-        INSERT INTO {table_name} (
-            CustomerPO, Company, OrderDate, StartDate, CompleteDate,
-            Department, DownloadDate, POType, Version, SourceTableId, ProcessedDate
-        )
-        OUTPUT INSERTED.Id
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, GETDATE())
+
+def iter_query(connection, query: str, params: Optional[List] = None,
+               batch_size: int = 500) -> Iterator[dict]:
     """
+    Execute parameterized SELECT and yield rows as dicts, batch_size at a time.
+    PERFORMANCE: Only one batch is held in memory instead of the full result set.
 
-    result = execute_query(db_connection, query, [
-        customer_po, company, order_date, start_date, complete_date,
-        department, download_date, po_type, version, source_table_id
-    ])
+    The cursor stays open until the generator is exhausted or closed and keeps its
+    connection busy until then. Stream on a connection of its own and run other
+    statements on a separate connection.
+    """
+    with _executed_cursor(connection, query, params) as cursor:
+        columns = [column[0] for column in cursor.description]
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(zip(columns, row))
 
-    return result[0]['Id']
 
+def iter_query_arrow(connection, query: str, params: Optional[List] = None) -> Iterator[dict]:
+    """
+    Execute parameterized SELECT on a turbodbc connection and yield rows as dicts.
+    PERFORMANCE: turbodbc fills columnar Arrow buffers in native code with the
+    GIL released, then each batch is converted to Python objects in one call.
 
-def insert_detail(header_id, style, color, size, qty, upc, sku, uom,
-                 unit_price, retail_price, inner_pack, qty_per_inner_pack,
-                 dc, store_number, is_bom, db_connection):
+    Requires turbodbc built with Arrow support (see connect_fast_fetch in config).
+    Only used for reads; all writes stay on pyodbc connections.
     """
-    Insert detail record.
-    SECURITY: Uses parameterized query.
-    SAFETY: Writes to staging table if in reprocess-all mode.
+    with _executed_cursor(connection, query, params) as cursor:
+        for batch in cursor.fetcharrowbatches():
+            yield from batch.to_pylist()
+
+
+def execute_many(connection, query: str, rows: List[tuple],
+                 batch_size: int = EXECUTEMANY_BATCH_SIZE):
     """
-    table_name = get_table_name('EDI_Report_Detail')
+    Execute a parameterized statement once per row using batched parameter arrays.
+    PERFORMANCE: fast_executemany sends each batch in a single round-trip.
 
-    query = f"""
-        INSERT INTO {table_name} (
-            HeaderId, Style, Color, Size, Qty, UPC, SKU, UOM,
-            UnitPrice, RetailPrice, InnerPack, QtyPerInnerPack,
-            DC, StoreNumber, IsBOM
-        )
-        OUTPUT INSERTED.Id
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    Commit behavior matches execute_query.
     """
+    if not rows:
+        return
 
-    result = execute_query(db_connection, query, [
-        header_id, style, color, size, qty, upc, sku, uom,
-        unit_price, retail_price, inner_pack, qty_per_inner_pack,
-        dc, store_number, is_bom
-    ])
+    cursor = connection.cursor()
+    cursor.fast_executemany = True
+    try:
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(query, rows[start:start + batch_size])
+    except Exception as e:
+        if connection.autocommit:
+            connection.rollback()
+        # SECURITY: Don't expose query or parameters in error
+        logging.error(f"Batch execution failed: {type(e).__name__}: {str(e)[:200]}")
+        raise
+    finally:
+        cursor.close()
+
+
+def insert_headers(rows, db_connection, tablock: bool = False):
+    """
+    Insert header records in batches.
+    Each row is a tuple in column order: (Id, CustomerPO, Company, OrderDate, StartDate,
+    CompleteDate, Department, DownloadDate, POType, Version, SourceTableId)
+    SECURITY: Uses parameterized query.
+    SAFETY: Writes to staging table if in reprocess-all mode.
+    """
+    execute_many(db_connection, _QUERY_CACHE['insert_header_tablock' if tablock else 'insert_header'], rows)
 
-    return result[0]['Id']
+
+def insert_details(rows, db_connection, tablock: bool = False):
+    """
+    Insert detail records in batches.
+    Each row is a tuple in column order: (Id, HeaderId, Style, Color, Size, Qty, UPC,
+    SKU, UOM, UnitPrice, RetailPrice, InnerPack, QtyPerInnerPack, DC, StoreNumber, IsBOM)
+    Ids come from DETAIL_IDS (EDI_Report_Detail_Seq).
+    SECURITY: Uses parameterized query.
+    SAFETY: Writes to staging table if in reprocess-all mode.
+    """
+    execute_many(db_connection, _QUERY_CACHE['insert_details_tablock' if tablock else 'insert_details'], rows)
 
 
-def insert_bom_component(detail_id, component_sku, component_size, component_qty,
-                        component_unit_price, component_retail_price, db_connection):
+def insert_bom_components(rows, db_connection, tablock: bool = False):
     """
-    Insert BOM component record.
+    Insert BOM component records in batches.
+    Each row is a tuple in column order: (DetailId, ComponentSKU, ComponentSize,
+    ComponentQty, ComponentUnitPrice, ComponentRetailPrice)
     SECURITY: Uses parameterized query.
     SAFETY: Writes to staging table if in reprocess-all mode.
     """
-    table_name = get_table_name('EDI_Report_BOM_Component')
+    execute_many(db_connection, _QUERY_CACHE['insert_bom_components_tablock' if tablock else 'insert_bom_components'], rows)
 
-    query = f"""
-        INSERT INTO {table_name} (
-            DetailId, ComponentSKU, ComponentSize, ComponentQty,
-            ComponentUnitPrice, ComponentRetailPrice
-        )
-        VALUES (?, ?, ?, ?, ?, ?)
+
+def _assign_report_ids(rows: ReportRows, db_connection):
     """
+    Give one record's rows their sequence IDs.
+    Returns (header_row, detail_rows, component_rows) in insert column order.
+    """
+    header_id = HEADER_IDS.take(1, db_connection)[0]
+    header_row = (header_id,) + rows.header
 
-    execute_query(db_connection, query, [
-        detail_id, component_sku, component_size, component_qty,
-        component_unit_price, component_retail_price
-    ])
+    if not rows.details:
+        return header_row, [], []
+
+    detail_ids = DETAIL_IDS.take(len(rows.details), db_connection)
+    detail_rows = [
+        (detail_id, header_id) + detail
+        for detail_id, detail in zip(detail_ids, rows.details)
+    ]
+
+    component_rows = []
+    if rows.detail_components:
+        component_rows = [
+            (detail_id,) + component
+            for detail_id, components in zip(detail_ids, rows.detail_components)
+            for component in components
+        ]
+
+    return header_row, detail_rows, component_rows
+
+
+def write_report_rows(rows: ReportRows, db_connection):
+    """
+    Write one record's header, details and BOM components.
+    PERFORMANCE: One statement per table with client-assigned IDs, regardless
+    of how many line items the order has.
+    Returns the new header ID.
+    """
+    header_row, detail_rows, component_rows = _assign_report_ids(rows, db_connection)
+
+    insert_header(*header_row, db_connection=db_connection)
+    if detail_rows:
+        insert_details(detail_rows, db_connection)
+    if component_rows:
+        insert_bom_components(component_rows, db_connection)
+
+    return header_row[0]
+
+
+class ReportRowBuffer:
+    """
+    Collects reporting rows across records and writes them in large batches.
+    PERFORMANCE: Rows go out as batched executemany INSERTs every BULK_FLUSH_ROWS
+    rows rather than per record, so the caller commits once per flush. Reprocess-all
+    owns its staging tables, so each INSERT takes a table lock (WITH (TABLOCK))
+    instead of row locks. The inserts are still fully logged.
+    SAFETY: Rows are not written until flush(); callers flush before committing.
+    """
+
+    def __init__(self, db_connection, flush_rows: int = BULK_FLUSH_ROWS):
+        self._db_connection = db_connection
+        self._flush_rows = flush_rows
+        self._headers = []
+        self._details = []
+        self._components = []
+
+    def add(self, rows: ReportRows):
+        """Buffer one record's rows; returns the new header ID"""
+        header_row, detail_rows, component_rows = _assign_report_ids(rows, self._db_connection)
+        self._headers.append(header_row)
+        self._details.extend(detail_rows)
+        self._components.extend(component_rows)
+        return header_row[0]
+
+    def is_full(self) -> bool:
+        return len(self._headers) + len(self._details) + len(self._components) >= self._flush_rows
+
+    def flush(self):
+        """Write buffered rows, parents before children"""
+        insert_headers(self._headers, self._db_connection, tablock=True)
+        insert_details(self._details, self._db_connection, tablock=True)
+        insert_bom_components(self._components, self._db_connection, tablock=True)
+        logging.debug("Flushed %d headers, %d details, %d BOM components",
+                      len(self._headers), len(self._details), len(self._components))
+        self._headers.clear()
+        self._details.clear()
+        self._components.clear()
 
 
 def insert_audit_log(db_connection, event_type: str, records_processed: int,
@@ -162,15 +564,17 @@ def insert_audit_log(db_connection, event_type: str, records_processed: int,
         )
         VALUES (?, ?, ?, ?, ?, SYSTEM_USER)
     """
-    execute_query(db_connection, query, [
+    execute_dml(db_connection, query, [
         event_type, records_processed, records_succeeded,
         records_failed, error_summary
     ])
 
 
-def mark_processing_status(db_connection, source_id, status, error_message):
+def mark_processing_statuses(db_connection, statuses: List[tuple]):
     """
-    Update EDIGatewayInbound with processing status.
+    Update EDIGatewayInbound with processing status for many records.
+    Each status is a tuple: (status, error_message, source_id)
+    PERFORMANCE: One batched UPDATE per EXECUTEMANY_BATCH_SIZE records.
     SECURITY: Uses parameterized query.
     """
     query = """
@@ -180,7 +584,7 @@ def mark_processing_status(db_connection, source_id, status, error_message):
             ReportingProcessError = ?
         WHERE Id = ?
     """
-    execute_query(db_connection, query, [status, error_message, source_id])
+    execute_many(db_connection, query, statuses)
 
 
 def mark_all_as_processed(db_connection):
@@ -196,43 +600,38 @@ def mark_all_as_processed(db_connection):
         WHERE TransactionType = '850'
         AND Status in ('downloaded', 'Obsolete')
     """
-    execute_query(db_connection, query)
+    execute_dml(db_connection, query)
     logging.info("Marked all EDI 850 records as successfully processed")
 
 
 def delete_existing_reporting_data(source_table_id, db_connection):
     """
     Delete existing reporting data for reprocessing.
+    PERFORMANCE: One set-based DELETE per table, regardless of header count.
     SECURITY: Uses parameterized queries to prevent injection.
     """
-    # Get header ID(s) for this source record
-    query = """
-        SELECT Id FROM EDI_Report_Header
+    # Delete BOM components first (foreign key constraint)
+    execute_dml(db_connection, """
+        DELETE bc
+        FROM EDI_Report_BOM_Component bc
+        JOIN EDI_Report_Detail d ON bc.DetailId = d.Id
+        JOIN EDI_Report_Header h ON d.HeaderId = h.Id
+        WHERE h.SourceTableId = ?
+    """, [source_table_id])
+
+    # Delete details
+    execute_dml(db_connection, """
+        DELETE d
+        FROM EDI_Report_Detail d
+        JOIN EDI_Report_Header h ON d.HeaderId = h.Id
+        WHERE h.SourceTableId = ?
+    """, [source_table_id])
+
+    # Delete header(s)
+    execute_dml(db_connection, """
+        DELETE FROM EDI_Report_Header
         WHERE SourceTableId = ?
-    """
-    headers = execute_query(db_connection, query, [source_table_id])
-
-    for header in headers:
-        # Delete BOM components first (foreign key constraint)
-        execute_query(db_connection, """
-            DELETE FROM EDI_Report_BOM_Component
-            WHERE DetailId IN (
-                SELECT Id FROM EDI_Report_Detail
-                WHERE HeaderId = ?
-            )
-        """, [header['Id']])
-
-        # Delete details
-        execute_query(db_connection, """
-            DELETE FROM EDI_Report_Detail
-            WHERE HeaderId = ?
-        """, [header['Id']])
-
-        # Delete header
-        execute_query(db_connection, """
-            DELETE FROM EDI_Report_Header
-            WHERE Id = ?
-        """, [header['Id']])
+    """, [source_table_id])
 
     logging.info(f"Deleted existing reporting data for SourceTableId={source_table_id}")
 
@@ -241,16 +640,12 @@ def get_next_version_number(customer_po, download_date, db_connection):
     """
     Calculate version number based on chronological order of download dates.
     Versions are recalculated on reprocessing to maintain consistency.
+    Headers with the same download date get the same version, and the next
+    date skips past them (like RANK): t1, t1, t2 -> 1, 1, 3.
+    PERFORMANCE: The COUNT is a range seek on IX_CustomerPO_DownloadDate.
     SECURITY: Uses parameterized query.
     SAFETY: Queries from staging table if in reprocess-all mode.
     """
-    table_name = get_table_name('EDI_Report_Header')
-
-    query = f"""
-        SELECT COUNT(*) + 1 AS NextVersion
-        FROM {table_name}
-        WHERE CustomerPO = ?
-        AND DownloadDate < ?
-    """
-    result = execute_query(db_connection, query, [customer_po, download_date])
+    result = execute_select(db_connection, _QUERY_CACHE['next_version'],
+                            [customer_po, download_date])
     return result[0]['NextVersion']
\ No newline at end of file
@@ -1,15 +1,175 @@
 import json
 import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import ExitStack
+from typing import NamedTuple
+
+try:
+    # PERFORMANCE: Native JSON parser; raises a json.JSONDecodeError subclass
+    import orjson as _json
+except ImportError:
+    _json = json
+
 from config import audit_logger
-from security import sanitize_error_message, log_audit_event, validate_json_structure
-from database import (execute_query, mark_processing_status, mark_all_as_processed, 
-                     delete_existing_reporting_data, get_next_version_number, insert_audit_log)
-from transformers import detect_order_type, process_prepack_order, process_bulk_order
+from security import (sanitize_error_message, log_audit_event, validate_json_structure,
+                      validate_payload_size)
+from database import (execute_query, iter_query, iter_query_arrow, mark_processing_statuses, mark_all_as_processed,
+                     write_report_rows, ReportRowBuffer,
+                     delete_existing_reporting_data, get_next_version_number,
+                     insert_audit_log, transaction)
+from transformers import detect_order_type, build_prepack_rows, build_bulk_rows
 from staging import (initialize_staging_tables, swap_to_staging_mode, reset_staging_mode,
                     swap_staging_to_production)
 
 
-def process_edi_transmissions(source_db_connection, target_db_connection, reprocess_all=False):
+# Source status updates sent per batch in incremental mode
+STATUS_FLUSH_INTERVAL = 500
+
+# Records queued ahead of the result loop, per worker, when max_workers > 1
+PENDING_RECORDS_PER_WORKER = 4
+
+
+class ParsedRecord(NamedTuple):
+    """EDI record parsed and validated once, with the fields the loader needs"""
+    edi_data: dict
+    customer_po: str
+    order_type: str
+
+
+def _parse_edi_record(json_content) -> ParsedRecord:
+    """
+    SECURITY: Parse and validate JSON content before any database work.
+    Extracts the PO number and order type in the same pass.
+    """
+    validate_payload_size(json_content)
+
+    try:
+        edi_data = _json.loads(json_content)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON content: {sanitize_error_message(e)}")
+
+    # SECURITY: Validate JSON structure before processing
+    validate_json_structure(edi_data)
+
+    return ParsedRecord(
+        edi_data=edi_data,
+        # SECURITY: validated in validate_json_structure
+        customer_po=edi_data['PurchaseOrderHeader']['PurchaseOrderNumber'],
+        order_type=detect_order_type(edi_data)
+    )
+
+
+def _process_record(record, target_db_connection, reprocess_all, row_buffer=None):
+    """
+    Parse, validate and load one EDI record into the reporting tables.
+    With row_buffer, the rows are buffered for a later batched flush instead.
+    Returns (customer_po, version) for logging.
+    """
+    parsed = _parse_edi_record(record['JSONContent'])
+
+    # SAFETY: No deletion in reprocess-all mode - building fresh in staging
+    # For incremental mode, delete only if updating existing record
+    if not reprocess_all and record['ReportingProcessStatus'] == 'Success':
+        # This is a re-run of previously successful record (rare edge case)
+        delete_existing_reporting_data(
+            record['Id'],
+            target_db_connection
+        )
+
+    # Calculate version number (precomputed by the source query in reprocess-all)
+    if reprocess_all:
+        version = record['Version']
+    else:
+        version = get_next_version_number(
+            parsed.customer_po,
+            record['DownloadDate'],
+            target_db_connection
+        )
+
+    # Process based on type
+    build_rows = build_prepack_rows if parsed.order_type == 'PREPACK' else build_bulk_rows
+    rows = build_rows(
+        edi_data=parsed.edi_data,
+        download_date=record['DownloadDate'],
+        source_table_id=record['Id'],
+        version=version
+    )
+
+    if row_buffer is not None:
+        row_buffer.add(rows)
+    else:
+        write_report_rows(rows, target_db_connection)
+
+    return parsed.customer_po, version
+
+
+def _flush_statuses(source_db_connection, pending_statuses):
+    """Write buffered (status, error_message, source_id) updates and clear the buffer"""
+    if pending_statuses:
+        mark_processing_statuses(source_db_connection, pending_statuses)
+        pending_statuses.clear()
+
+
+def _load_records_parallel(records, target_pool, reprocess_all, max_workers, unclaimed):
+    """
+    Load records on max_workers threads, each with its own pooled target connection.
+    PERFORMANCE: Inserts for different POs run concurrently on separate connections.
+    SAFETY: In incremental mode, records for the same CustomerPO still load one
+    at a time in download order, so get_next_version_number sees earlier versions.
+
+    Yields (record, future) in source order; future.result() is (customer_po, version).
+    Submitted but not yet yielded pairs are kept in the unclaimed deque. If the
+    generator is closed early, loads that haven't started are cancelled and the
+    running ones are waited for, so the caller can record their statuses.
+    """
+    worker_state = threading.local()
+    connections_lock = threading.Lock()
+
+    with ExitStack() as connections, ThreadPoolExecutor(max_workers=max_workers) as executor:
+
+        def load(record, previous):
+            if previous is not None:
+                wait([previous])
+
+            connection = getattr(worker_state, 'connection', None)
+            if connection is None:
+                with connections_lock:
+                    connection = connections.enter_context(target_pool.acquire())
+                worker_state.connection = connection
+
+            # Each record's reporting rows commit or roll back together
+            with transaction(connection):
+                return _process_record(record, connection, reprocess_all)
+
+        last_by_po = {}
+        try:
+            for record in records:
+                customer_po = record['CustomerPO']
+                # Reprocess-all versions come from the source query, so order doesn't matter
+                previous = None if reprocess_all else last_by_po.get(customer_po)
+
+                future = executor.submit(load, record, previous)
+                if customer_po is not None:
+                    last_by_po[customer_po] = future
+
+                unclaimed.append((record, future))
+                if len(unclaimed) > max_workers * PENDING_RECORDS_PER_WORKER:
+                    yield unclaimed.popleft()
+
+            while unclaimed:
+                yield unclaimed.popleft()
+        finally:
+            # Workers take records in submission order, so a cancelled load is never
+            # the predecessor of one already running
+            for _, future in unclaimed:
+                future.cancel()
+
+
+def process_edi_transmissions(source_db_connection, target_db_connection, reprocess_all=False,
+                              fetch_connection=None, target_pool=None, max_workers=1,
+                              read_connection=None):
     """
     Process EDI 850 transmissions from EDIGatewayInbound.
     SECURITY: Comprehensive error handling and audit logging.
@@ -20,7 +180,16 @@ def process_edi_transmissions(source_db_connection, target_db_connection, reproc
     Args:
         reprocess_all: If True, reprocess ALL records into staging tables, then swap
                       If False, only process new/failed records into production tables
+        fetch_connection: Optional turbodbc connection to the source database used
+                          only to read EDIGatewayInbound (see --fast-fetch)
+        target_pool: ConnectionPool for the reporting database, required when max_workers > 1
+        max_workers: Number of threads loading records; each uses its own target connection
+        read_connection: Optional second pyodbc connection to the source database used
+                         only to stream EDIGatewayInbound. Without it the records stream
+                         on source_db_connection while status updates run, which needs MARS.
     """
+    if max_workers > 1 and target_pool is None:
+        raise ValueError("target_pool is required when max_workers > 1")
 
     # SAFETY: For reprocess-all, use staging tables
     if reprocess_all:
@@ -33,11 +202,27 @@ def process_edi_transmissions(source_db_connection, target_db_connection, reproc
         # Override table names to use staging
         swap_to_staging_mode()
 
+        # PERFORMANCE: Commit staging writes once per buffer flush rather than
+        # per statement. Any failure aborts the swap, so staging only needs
+        # to be complete when every record succeeds.
+        original_autocommit = target_db_connection.autocommit
+        target_db_connection.autocommit = False
+
     # Initialize variables OUTSIDE try block to ensure they exist even if query fails
     success_count = 0
     failure_count = 0
     error_summary = []
-    edi_records = []
+    record_count = 0
+    pending_statuses = []
+    records = None
+    loaded = None
+    # Records submitted to worker threads but not yet seen by the main loop
+    unclaimed = deque()
+
+    # PERFORMANCE: Serial reprocess-all batches staging rows across records
+    row_buffer = None
+    if reprocess_all and max_workers == 1:
+        row_buffer = ReportRowBuffer(target_db_connection)
 
     try:
         # Build query based on reprocess flag
@@ -53,7 +238,34 @@ def process_edi_transmissions(source_db_connection, target_db_connection, reproc
                 AND (ReportingProcessStatus IS NULL OR ReportingProcessStatus = 'Failed')
             """
 
+        # Reprocess-all rebuilds from empty staging tables, so every version is
+        # ranked server-side here instead of looked up once per record.
+        # RANK numbers tied download dates like get_next_version_number (t1, t1, t2 -> 1, 1, 3),
+        # so reprocess-all and incremental runs assign the same versions.
+        if reprocess_all:
+            version_column = """,
+                RANK() OVER (PARTITION BY CustomerPO ORDER BY Created) AS Version"""
+        else:
+            version_column = ""
+
+        # CustomerPO is extracted server-side (ISJSON guards malformed content)
         query = f"""
+            WITH Inbound AS (
+                SELECT
+                    Id,
+                    Created,
+                    CompanyCode,
+                    Channel,
+                    TransactionType,
+                    JSONContent,
+                    ReportingProcessStatus,
+                    ReportingProcessed,
+                    CASE WHEN ISJSON(JSONContent) = 1
+                        THEN JSON_VALUE(JSONContent, '$.PurchaseOrderHeader.PurchaseOrderNumber')
+                    END AS CustomerPO
+                FROM EDIGatewayInbound
+                {where_clause}
+            )
             SELECT
                 Id,
                 Created AS DownloadDate,
@@ -62,77 +274,48 @@ def process_edi_transmissions(source_db_connection, target_db_connection, reproc
                 TransactionType,
                 JSONContent,
                 ReportingProcessStatus,
-                ReportingProcessed
-            FROM EDIGatewayInbound
-            {where_clause}
+                ReportingProcessed,
+                CustomerPO{version_column}
+            FROM Inbound
             ORDER BY Created ASC
         """
 
-        edi_records = execute_query(source_db_connection, query)
-        logging.info(f"Retrieved {len(edi_records)} records for processing")
+        if fetch_connection is not None:
+            records = iter_query_arrow(fetch_connection, query)
+        else:
+            records = iter_query(read_connection or source_db_connection, query)
 
-        # Main processing loop
-        for record in edi_records:
-            try:
-                # SAFETY: No deletion in reprocess-all mode - building fresh in staging
-                # For incremental mode, delete only if updating existing record
-                if not reprocess_all and record['ReportingProcessStatus'] == 'Success':
-                    # This is a re-run of previously successful record (rare edge case)
-                    delete_existing_reporting_data(
-                        record['Id'],
-                        target_db_connection
-                    )
+        if max_workers > 1:
+            loaded = _load_records_parallel(records, target_pool, reprocess_all, max_workers,
+                                            unclaimed)
+        else:
+            loaded = ((record, None) for record in records)
 
-                # SECURITY: Parse and validate JSON
-                try:
-                    edi_data = json.loads(record['JSONContent'])
-                except json.JSONDecodeError as e:
-                    raise ValueError(f"Invalid JSON content: {sanitize_error_message(e)}")
-
-                # SECURITY: Validate JSON structure before processing
-                validate_json_structure(edi_data)
-
-                # Extract PO number (SECURITY: validated in validate_json_structure)
-                customer_po = edi_data['PurchaseOrderHeader']['PurchaseOrderNumber']
-
-                # Calculate version number
-                version = get_next_version_number(
-                    customer_po,
-                    record['DownloadDate'],
-                    target_db_connection
-                )
-
-                # Detect order type
-                order_type = detect_order_type(edi_data)
-
-                # Process based on type
-                if order_type == 'PREPACK':
-                    process_prepack_order(
-                        edi_data=edi_data,
-                        download_date=record['DownloadDate'],
-                        source_table_id=record['Id'],
-                        version=version,
-                        db_connection=target_db_connection
+        # Main processing loop - records are streamed, not loaded all at once
+        for record, future in loaded:
+            record_count += 1
+            try:
+                if future is not None:
+                    # Loaded and committed by a worker thread
+                    customer_po, version = future.result()
+                elif reprocess_all:
+                    # Staging rows are buffered and committed per flush (see below)
+                    customer_po, version = _process_record(
+                        record, target_db_connection, reprocess_all, row_buffer
                     )
                 else:
-                    process_bulk_order(
-                        edi_data=edi_data,
-                        download_date=record['DownloadDate'],
-                        source_table_id=record['Id'],
-                        version=version,
-                        db_connection=target_db_connection
-                    )
+                    # Each record's reporting rows commit or roll back together
+                    with transaction(target_db_connection):
+                        customer_po, version = _process_record(
+                            record, target_db_connection, reprocess_all
+                        )
 
                 # Mark as successfully processed (only in incremental mode)
                 if not reprocess_all:
-                    mark_processing_status(
-                        source_db_connection,
-                        record['Id'],
-                        status='Success',
-                        error_message=None
-                    )
+                    pending_statuses.append(('Success', None, record['Id']))
 
                 success_count += 1
+
                 # SECURITY: Don't log sensitive PO details, just identifiers
                 logging.info(f"✓ Processed PO {customer_po} v{version} (ID={record['Id']})")
 
@@ -142,12 +325,7 @@ def process_edi_transmissions(source_db_connection, target_db_connection, reproc
 
                 # Mark as failed (only in incremental mode)
                 if not reprocess_all:
-                    mark_processing_status(
-                        source_db_connection,
-                        record['Id'],
-                        status='Failed',
-                        error_message=error_msg
-                    )
+                    pending_statuses.append(('Failed', error_msg, record['Id']))
 
                 failure_count += 1
                 error_summary.append(f"ID={record['Id']}: {error_msg}")
@@ -157,6 +335,24 @@ def process_edi_transmissions(source_db_connection, target_db_connection, reproc
 
                 # Continue processing other records (don't stop entire job)
 
+            # PERFORMANCE: Status updates go to the source in batches
+            if len(pending_statuses) >= STATUS_FLUSH_INTERVAL:
+                _flush_statuses(source_db_connection, pending_statuses)
+
+            if row_buffer is not None and row_buffer.is_full():
+                row_buffer.flush()
+                target_db_connection.commit()
+
+        _flush_statuses(source_db_connection, pending_statuses)
+        logging.info(f"Read {record_count} records from EDIGatewayInbound")
+
+        if reprocess_all:
+            # Write and commit the last partial batch, then return to per-statement commits
+            if row_buffer is not None:
+                row_buffer.flush()
+            target_db_connection.commit()
+            target_db_connection.autocommit = original_autocommit
+
         # SAFETY: If reprocess-all and successful, swap staging to production
         if reprocess_all:
             if failure_count == 0:
@@ -175,7 +371,7 @@ def process_edi_transmissions(source_db_connection, target_db_connection, reproc
         # SECURITY: Log audit event
         log_audit_event(
             event_type='REPROCESS_ALL' if reprocess_all else 'NORMAL_RUN',
-            records_processed=len(edi_records),
+            records_processed=record_count,
             records_succeeded=success_count,
             records_failed=failure_count,
             error_summary='; '.join(error_summary[:5]) if error_summary else None  # First 5 errors only
@@ -185,7 +381,7 @@ def process_edi_transmissions(source_db_connection, target_db_connection, reproc
         insert_audit_log(
             target_db_connection,
             event_type='REPROCESS_ALL' if reprocess_all else 'NORMAL_RUN',
-            records_processed=len(edi_records),
+            records_processed=record_count,
             records_succeeded=success_count,
             records_failed=failure_count,
             error_summary='; '.join(error_summary[:10]) if error_summary else None
@@ -195,12 +391,40 @@ def process_edi_transmissions(source_db_connection, target_db_connection, reproc
         return success_count, failure_count
 
     finally:
+        # SAFETY: If the run stopped early, stop submitting loads and wait for the
+        # workers. Records they committed get a status below, so the next run
+        # doesn't load them again as new records.
+        if loaded is not None:
+            loaded.close()
+            if not reprocess_all:
+                for record, future in unclaimed:
+                    if future.cancelled():
+                        continue
+                    error = future.exception()
+                    if error is None:
+                        pending_statuses.append(('Success', None, record['Id']))
+                    else:
+                        pending_statuses.append(('Failed', sanitize_error_message(error), record['Id']))
+
+        # Release the source cursor before its connection goes back to the pool
+        if records is not None:
+            records.close()
+
+        # SAFETY: Record the status of records already loaded, even if the run
+        # stopped early, so they aren't loaded again as new on the next run
+        try:
+            _flush_statuses(source_db_connection, pending_statuses)
+        except Exception as e:
+            logging.error(f"Failed to write {len(pending_statuses)} processing statuses: {sanitize_error_message(e)}")
+
         # SAFETY: Always reset staging mode flag, even if processing failed
         if reprocess_all:
             reset_staging_mode()
+            target_db_connection.autocommit = original_autocommit
 
 
-def reprocess_failed_records(source_conn, target_conn):
+def reprocess_failed_records(source_conn, target_conn, fetch_connection=None,
+                             target_pool=None, max_workers=1, read_connection=None):
     """
     Reprocess only records that previously failed.
     SECURITY: Audit logged.
@@ -219,4 +443,7 @@ def reprocess_failed_records(source_conn, target_conn):
     execute_query(source_conn, query)
     logging.info("Reset failed records for reprocessing")
 
-    process_edi_transmissions(source_conn, target_conn, reprocess_all=False)
\ No newline at end of file
+    process_edi_transmissions(source_conn, target_conn, reprocess_all=False,
+                              fetch_connection=fetch_connection,
+                              target_pool=target_pool, max_workers=max_workers,
+                              read_connection=read_connection)
\ No newline at end of file
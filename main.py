@@ -1,8 +1,12 @@
 import argparse
 import logging
+from contextlib import nullcontext
+from functools import partial
 from config import connect_to_database, audit_logger
+from database import ConnectionPool
 from security import sanitize_error_message
 from etl_processor import process_edi_transmissions, reprocess_failed_records
+from staging import upgrade_report_tables
 
 
 def main():
@@ -20,8 +24,21 @@ def main():
         action='store_true',
         help='Reprocess only previously failed records'
     )
+    parser.add_argument(
+        '--fast-fetch',
+        action='store_true',
+        help='Read EDIGatewayInbound through turbodbc/Arrow (requires turbodbc and pyarrow)'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Threads loading records into the reporting database, one connection each (default: 1)'
+    )
 
     args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
 
     # SECURITY: Log command-line arguments (audit trail)
     logging.info(f"ETL job started with arguments: {args}")
@@ -31,24 +48,53 @@ def main():
         logging.warning("REPROCESS-ALL mode enabled - will rebuild data via staging tables")
         audit_logger.warning("REPROCESS-ALL mode enabled")
 
-    source_conn = None
-    target_conn = None
+    source_pool = None
+    target_pool = None
+    fetch_conn = None
 
     try:
         # SECURITY: Connect using Windows Authentication
-        source_conn = connect_to_database('source')
-        target_conn = connect_to_database('reporting')
-
-        if args.reprocess_failed:
-            # Only reprocess failed records
-            reprocess_failed_records(source_conn, target_conn)
-        else:
-            # Normal processing (or full reprocess if flag set)
-            process_edi_transmissions(
-                source_conn,
-                target_conn,
-                reprocess_all=args.reprocess_all
-            )
+        source_pool = ConnectionPool(partial(connect_to_database, 'source'), min_size=1)
+        # One reporting connection per worker, plus one for staging setup and the audit log
+        target_pool = ConnectionPool(partial(connect_to_database, 'reporting'), min_size=1,
+                                     max_size=max(10, args.workers + 1))
+
+        if args.fast_fetch:
+            # PERFORMANCE: Columnar reads for the large JSONContent column; writes stay on pyodbc
+            from config import connect_fast_fetch
+            fetch_conn = connect_fast_fetch('source')
+
+        # Records stream on their own source connection so status updates
+        # can run on source_conn without MARS (not needed with --fast-fetch)
+        read_source = nullcontext() if fetch_conn else source_pool.acquire()
+
+        with source_pool.acquire() as source_conn, target_pool.acquire() as target_conn, \
+                read_source as read_conn:
+            if not args.reprocess_all:
+                # Incremental loads write client-assigned IDs into the production tables
+                upgrade_report_tables(target_conn)
+
+            if args.reprocess_failed:
+                # Only reprocess failed records
+                reprocess_failed_records(
+                    source_conn,
+                    target_conn,
+                    fetch_connection=fetch_conn,
+                    target_pool=target_pool,
+                    max_workers=args.workers,
+                    read_connection=read_conn
+                )
+            else:
+                # Normal processing (or full reprocess if flag set)
+                process_edi_transmissions(
+                    source_conn,
+                    target_conn,
+                    reprocess_all=args.reprocess_all,
+                    fetch_connection=fetch_conn,
+                    target_pool=target_pool,
+                    max_workers=args.workers,
+                    read_connection=read_conn
+                )
 
         logging.info("ETL job completed successfully")
 
@@ -64,12 +110,14 @@ def main():
         raise
     finally:
         # Always close connections
-        if source_conn:
-            source_conn.close()
-            logging.info("Source connection closed")
-        if target_conn:
-            target_conn.close()
-            logging.info("Reporting connection closed")
+        if fetch_conn:
+            fetch_conn.close()
+        if source_pool:
+            source_pool.close()
+            logging.info("Source connection pool closed")
+        if target_pool:
+            target_pool.close()
+            logging.info("Reporting connection pool closed")
 
 
 if __name__ == "__main__":
@@ -1,7 +1,49 @@
 import re
 import logging
 from typing import Optional
-from config import audit_logger
+
+try:
+    # SECURITY: Linear-time matching on exception text we don't control
+    import re2 as _regex
+except ImportError:
+    _regex = re
+
+try:
+    import orjson
+
+    def _to_json(record: dict) -> str:
+        return orjson.dumps(record).decode()
+except ImportError:
+    import json
+
+    def _to_json(record: dict) -> str:
+        return json.dumps(record, separators=(',', ':'), ensure_ascii=False)
+
+# Configured by config.py; looked up by name so this module doesn't import config
+audit_logger = logging.getLogger('audit')
+
+
+# Longest error message stored or scanned for sensitive patterns
+MAX_ERROR_MESSAGE_LENGTH = 500
+
+# Required structure of an EDI 850 document, checked by validate_json_structure
+REQUIRED_HEADER_FIELDS = ('PurchaseOrderNumber', 'CompanyCode', 'PurchaseOrder')
+MAX_PO_NUMBER_LENGTH = 50
+MAX_LINE_ITEMS = 10000  # SECURITY: prevent DOS
+
+# Largest JSONContent accepted for parsing, in characters (bytes for bytes input)
+MAX_JSON_CONTENT_LENGTH = 16_000_000
+
+# Marks an absent key in single-lookup dict.get() checks
+_MISSING = object()
+
+# Sensitive patterns removed from error messages, applied in order - a later pattern
+# sees the earlier redactions, so they must not be combined into one alternation
+_SENSITIVE_PATTERNS = tuple(_regex.compile(pattern) for pattern in (
+    r'C:\\[^\s]+',  # File paths
+    r'Server=[^;]+',  # Server names
+    r'Password=[^;]+',  # Passwords (shouldn't exist, but belt-and-suspenders)
+))
 
 
 def sanitize_error_message(error: Exception) -> str:
@@ -13,18 +55,13 @@ def sanitize_error_message(error: Exception) -> str:
     error_msg = str(error)
 
     # Truncate to prevent excessive data in database
-    if len(error_msg) > 500:
-        error_msg = error_msg[:497] + "..."
+    # PERFORMANCE: Done before redaction so the regex scan is bounded too
+    if len(error_msg) > MAX_ERROR_MESSAGE_LENGTH:
+        error_msg = error_msg[:MAX_ERROR_MESSAGE_LENGTH - 3] + "..."
 
     # Remove potentially sensitive patterns
-    sensitive_patterns = [
-        r'C:\\[^\s]+',  # File paths
-        r'Server=[^;]+',  # Server names
-        r'Password=[^;]+',  # Passwords (shouldn't exist, but belt-and-suspenders)
-    ]
-
-    for pattern in sensitive_patterns:
-        error_msg = re.sub(pattern, '[REDACTED]', error_msg)
+    for pattern in _SENSITIVE_PATTERNS:
+        error_msg = pattern.sub('[REDACTED]', error_msg)
 
     return f"{error_type}: {error_msg}"
 
@@ -36,13 +73,25 @@ def log_audit_event(event_type: str, records_processed: int,
     SECURITY: Log audit trail of ETL operations.
     Critical for compliance and troubleshooting.
     """
-    audit_logger.info(
-        f"EventType={event_type} | "
-        f"Processed={records_processed} | "
-        f"Succeeded={records_succeeded} | "
-        f"Failed={records_failed} | "
-        f"Errors={error_summary or 'None'}"
-    )
+    # One JSON object per line, so audit logs can be loaded without parsing text
+    if audit_logger.isEnabledFor(logging.INFO):
+        audit_logger.info(_to_json({
+            'EventType': event_type,
+            'Processed': records_processed,
+            'Succeeded': records_succeeded,
+            'Failed': records_failed,
+            'Errors': error_summary,
+        }))
+
+
+def validate_payload_size(json_content) -> None:
+    """
+    SECURITY: Reject oversized payloads before parsing.
+    Prevents a huge document from being materialized only to fail validation.
+    """
+    # NULL content is left for the parser to report
+    if json_content is not None and len(json_content) > MAX_JSON_CONTENT_LENGTH:
+        raise ValueError(f"JSONContent exceeds maximum size: {len(json_content)}")
 
 
 def validate_json_structure(edi_data: dict) -> None:
@@ -57,26 +106,29 @@ def validate_json_structure(edi_data: dict) -> None:
     po_header = edi_data['PurchaseOrderHeader']
 
     # Required header fields
-    required_fields = ['PurchaseOrderNumber', 'CompanyCode', 'PurchaseOrder']
-    for field in required_fields:
+    for field in REQUIRED_HEADER_FIELDS:
         if field not in po_header:
             raise ValueError(f"Missing required field: PurchaseOrderHeader.{field}")
 
     # Validate PurchaseOrderNumber is not suspiciously long
     po_number = po_header['PurchaseOrderNumber']
-    if len(str(po_number)) > 50:
-        raise ValueError(f"PurchaseOrderNumber exceeds maximum length: {len(po_number)}")
+    po_number_length = len(po_number) if type(po_number) is str else len(str(po_number))
+    if po_number_length > MAX_PO_NUMBER_LENGTH:
+        raise ValueError(f"PurchaseOrderNumber exceeds maximum length: {po_number_length}")
 
     # Validate PurchaseOrder structure
     po_details = po_header['PurchaseOrder']
-    if 'PurchaseOrderDetails' not in po_details:
+    line_items = po_details.get('PurchaseOrderDetails', _MISSING) if type(po_details) is dict else _MISSING
+    if line_items is _MISSING:
         raise ValueError("Missing required field: PurchaseOrder.PurchaseOrderDetails")
 
-    if not isinstance(po_details['PurchaseOrderDetails'], list):
+    if type(line_items) is not list:
         raise ValueError("PurchaseOrderDetails must be an array")
 
     # SECURITY: Limit on number of line items (prevent DOS)
-    if len(po_details['PurchaseOrderDetails']) > 10000:
-        raise ValueError(f"Excessive line items: {len(po_details['PurchaseOrderDetails'])}")
+    line_item_count = len(line_items)
+    if line_item_count > MAX_LINE_ITEMS:
+        raise ValueError(f"Excessive line items: {line_item_count}")
 
-    logging.debug(f"JSON validation passed for PO {po_number}")
\ No newline at end of file
+    # PERFORMANCE: Runs per record; %-args are only formatted if DEBUG is emitted
+    logging.debug("JSON validation passed for PO %s", po_number)
\ No newline at end of file
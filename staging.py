@@ -1,40 +1,45 @@
 import logging
+from functools import lru_cache
 from typing import Optional
+from database import REPORT_TABLES, execute_batch, refresh_query_cache
+from security import sanitize_error_message
 
 
-# SAFETY: Global flag for staging table mode
-_STAGING_MODE = False
+def _production_table_name(base_name):
+    """SAFETY: Production mode - tables are used under their own names"""
+    return base_name
 
 
-def initialize_staging_tables(db_connection):
+@lru_cache(maxsize=8)
+def _staging_table_name(base_name):
     """
-    SAFETY: Create or truncate staging tables for reprocess-all.
-    Staging tables mirror production schema.
+    SAFETY: Staging mode - writes go to the _Staging copy of each table.
+    PERFORMANCE: Cached - there are only a few report tables.
     """
-    from database import execute_query
-    
-    logging.info("Initializing staging tables for reprocess-all")
+    return f"{base_name}_Staging"
 
-    # Drop and recreate staging tables to ensure clean state
-    execute_query(db_connection, """
-        IF OBJECT_ID('EDI_Report_BOM_Component_Staging', 'U') IS NOT NULL
-            DROP TABLE EDI_Report_BOM_Component_Staging
-    """)
 
-    execute_query(db_connection, """
-        IF OBJECT_ID('EDI_Report_Detail_Staging', 'U') IS NOT NULL
-            DROP TABLE EDI_Report_Detail_Staging
-    """)
+# SAFETY: Get the appropriate table name (staging or production).
+# PERFORMANCE: Rebound on mode switch instead of checking a flag on every call.
+# Call it as staging.get_table_name so the current binding is used.
+get_table_name = _production_table_name
 
-    execute_query(db_connection, """
-        IF OBJECT_ID('EDI_Report_Header_Staging', 'U') IS NOT NULL
-            DROP TABLE EDI_Report_Header_Staging
-    """)
 
-    # Create staging tables (no foreign keys for flexibility)
-    execute_query(db_connection, """
-        CREATE TABLE EDI_Report_Header_Staging (
-            Id INT IDENTITY PRIMARY KEY,
+def resolve_table_names() -> dict:
+    """
+    SAFETY: Resolve the report table names for the current mode in one call.
+    Returns {'header': ..., 'detail': ..., 'bom': ...}
+    """
+    return {role: get_table_name(table) for role, table in REPORT_TABLES.items()}
+
+
+# Report table definitions, formatted with the table name. Header and detail IDs
+# default to the sequences so the loader can assign them client-side.
+# No foreign keys, for flexibility.
+_REPORT_TABLE_DDL = {
+    'header': """
+        CREATE TABLE {table} (
+            Id INT NOT NULL DEFAULT (NEXT VALUE FOR EDI_Report_Header_Seq) PRIMARY KEY,
             CustomerPO VARCHAR(50) NOT NULL,
             Company VARCHAR(100),
             StartDate DATE,
@@ -47,15 +52,13 @@ def initialize_staging_tables(db_connection):
             SourceTableId INT,
             ProcessedDate DATETIME DEFAULT GETDATE(),
 
-            INDEX IX_CustomerPO (CustomerPO),
+            INDEX IX_CustomerPO_DownloadDate (CustomerPO, DownloadDate),
             INDEX IX_CustomerPO_Version (CustomerPO, Version),
             INDEX IX_SourceTableId (SourceTableId)
-        )
-    """)
-
-    execute_query(db_connection, """
-        CREATE TABLE EDI_Report_Detail_Staging (
-            Id INT IDENTITY PRIMARY KEY,
+        );""",
+    'detail': """
+        CREATE TABLE {table} (
+            Id INT NOT NULL DEFAULT (NEXT VALUE FOR EDI_Report_Detail_Seq) PRIMARY KEY,
             HeaderId INT,
             Style VARCHAR(50),
             Color VARCHAR(50),
@@ -74,11 +77,9 @@ def initialize_staging_tables(db_connection):
 
             INDEX IX_HeaderId (HeaderId),
             INDEX IX_Style_Color (Style, Color)
-        )
-    """)
-
-    execute_query(db_connection, """
-        CREATE TABLE EDI_Report_BOM_Component_Staging (
+        );""",
+    'bom': """
+        CREATE TABLE {table} (
             Id INT IDENTITY PRIMARY KEY,
             DetailId INT,
             ComponentSKU VARCHAR(50),
@@ -88,7 +89,53 @@ def initialize_staging_tables(db_connection):
             ComponentRetailPrice DECIMAL(18,4),
 
             INDEX IX_DetailId (DetailId)
-        )
+        );""",
+}
+
+# Columns copied when a production table is rebuilt by upgrade_report_tables
+_REPORT_TABLE_COLUMNS = {
+    'header': ('Id, CustomerPO, Company, StartDate, CompleteDate, Department, DownloadDate, '
+               'OrderDate, POType, Version, SourceTableId, ProcessedDate'),
+    'detail': ('Id, HeaderId, Style, Color, Size, UPC, SKU, Qty, UOM, UnitPrice, RetailPrice, '
+               'InnerPack, QtyPerInnerPack, DC, StoreNumber, IsBOM'),
+}
+
+_CREATE_SEQUENCES_SQL = """
+        IF OBJECT_ID('EDI_Report_Header_Seq', 'SO') IS NULL
+            CREATE SEQUENCE EDI_Report_Header_Seq AS INT START WITH 1;
+
+        IF OBJECT_ID('EDI_Report_Detail_Seq', 'SO') IS NULL
+            CREATE SEQUENCE EDI_Report_Detail_Seq AS INT START WITH 1;
+"""
+
+
+def initialize_staging_tables(db_connection):
+    """
+    SAFETY: Create or truncate staging tables for reprocess-all.
+    Staging tables mirror production schema.
+    PERFORMANCE: All DDL is sent as one batch.
+    """
+    logging.info("Initializing staging tables for reprocess-all")
+
+    create_tables = "\n".join(
+        _REPORT_TABLE_DDL[role].format(table=_staging_table_name(table))
+        for role, table in REPORT_TABLES.items()
+    )
+
+    execute_batch(db_connection, f"""
+        SET NOCOUNT ON;
+
+        -- Drop and recreate staging tables to ensure clean state
+        DROP TABLE IF EXISTS
+            EDI_Report_BOM_Component_Staging,
+            EDI_Report_Detail_Staging,
+            EDI_Report_Header_Staging;
+
+        -- Sequences for client-assigned header/detail IDs, shared with production
+        {_CREATE_SEQUENCES_SQL}
+
+        -- Create staging tables
+        {create_tables}
     """)
 
     logging.info("Staging tables created successfully")
@@ -98,50 +145,184 @@ def swap_staging_to_production(db_connection):
     """
     SAFETY: Atomic swap of staging tables to production.
     Uses table renaming for near-zero downtime.
-    All renames occur in a single transaction - if any fail, all are rolled back.
+    All renames occur in a single server-side transaction - if any fail, all are
+    rolled back and the backup tables are not dropped.
+    PERFORMANCE: Renames and backup drops are one round-trip, so schema locks
+    are held only for the duration of the renames.
     """
-    from database import execute_query, transaction
-    from security import sanitize_error_message
-
     logging.info("Beginning staging to production swap")
 
+    # The script manages its own transaction
+    original_autocommit = db_connection.autocommit
+    db_connection.autocommit = True
+
     try:
-        # All renames in a single atomic transaction
-        with transaction(db_connection):
-            # Rename production tables to backup
-            execute_query(db_connection, """
-                EXEC sp_rename 'EDI_Report_BOM_Component', 'EDI_Report_BOM_Component_Backup'
-            """)
-            execute_query(db_connection, """
-                EXEC sp_rename 'EDI_Report_Detail', 'EDI_Report_Detail_Backup'
-            """)
-            execute_query(db_connection, """
-                EXEC sp_rename 'EDI_Report_Header', 'EDI_Report_Header_Backup'
-            """)
-
-            # Rename staging tables to production
-            execute_query(db_connection, """
-                EXEC sp_rename 'EDI_Report_BOM_Component_Staging', 'EDI_Report_BOM_Component'
-            """)
-            execute_query(db_connection, """
-                EXEC sp_rename 'EDI_Report_Detail_Staging', 'EDI_Report_Detail'
-            """)
-            execute_query(db_connection, """
-                EXEC sp_rename 'EDI_Report_Header_Staging', 'EDI_Report_Header'
-            """)
-
-        # Transaction committed successfully
-        logging.info("Staging tables successfully promoted to production")
-
-        # Drop backup tables after successful swap (separate transactions - not critical)
-        execute_query(db_connection, "DROP TABLE EDI_Report_BOM_Component_Backup")
-        execute_query(db_connection, "DROP TABLE EDI_Report_Detail_Backup")
-        execute_query(db_connection, "DROP TABLE EDI_Report_Header_Backup")
-        logging.info("Backup tables dropped")
+        execute_batch(db_connection, """
+            SET NOCOUNT ON;
+            SET XACT_ABORT ON;
+
+            BEGIN TRY
+                BEGIN TRANSACTION;
+
+                -- Rename production tables to backup
+                EXEC sp_rename 'EDI_Report_BOM_Component', 'EDI_Report_BOM_Component_Backup';
+                EXEC sp_rename 'EDI_Report_Detail', 'EDI_Report_Detail_Backup';
+                EXEC sp_rename 'EDI_Report_Header', 'EDI_Report_Header_Backup';
+
+                -- Rename staging tables to production
+                EXEC sp_rename 'EDI_Report_BOM_Component_Staging', 'EDI_Report_BOM_Component';
+                EXEC sp_rename 'EDI_Report_Detail_Staging', 'EDI_Report_Detail';
+                EXEC sp_rename 'EDI_Report_Header_Staging', 'EDI_Report_Header';
+
+                COMMIT TRANSACTION;
+            END TRY
+            BEGIN CATCH
+                -- sp_rename errors don't trigger XACT_ABORT, so roll back explicitly
+                IF @@TRANCOUNT > 0
+                    ROLLBACK TRANSACTION;
+                THROW;
+            END CATCH;
+
+            -- Only reached after the swap committed
+            DROP TABLE EDI_Report_BOM_Component_Backup;
+            DROP TABLE EDI_Report_Detail_Backup;
+            DROP TABLE EDI_Report_Header_Backup;
+        """)
+
+        logging.info("Staging tables successfully promoted to production, backup tables dropped")
 
     except Exception as e:
+        # SAFETY: Never leave the swap transaction open (e.g. after a client timeout)
+        try:
+            execute_batch(db_connection, "IF @@TRANCOUNT > 0 ROLLBACK TRANSACTION;")
+        except Exception:
+            pass
         logging.error(f"Failed to swap staging to production: {sanitize_error_message(e)}")
         raise
+    finally:
+        db_connection.autocommit = original_autocommit
+
+
+def _rebuild_with_sequence_id_sql(role):
+    """Rebuild a production table still on an IDENTITY Id with a sequence default."""
+    table = REPORT_TABLES[role]
+    columns = _REPORT_TABLE_COLUMNS[role]
+    return f"""
+                IF COLUMNPROPERTY(OBJECT_ID('{table}'), 'Id', 'IsIdentity') = 1
+                BEGIN
+                    EXEC sp_rename '{table}', '{table}_PreSequence';
+                    {_REPORT_TABLE_DDL[role].format(table=table)}
+                    INSERT INTO {table} ({columns})
+                    SELECT {columns} FROM {table}_PreSequence;
+                    DROP TABLE {table}_PreSequence;
+                END;"""
+
+
+def _restart_sequence_sql(role, sequence_name):
+    """Move a sequence past the highest Id already in its production table."""
+    table = REPORT_TABLES[role]
+    return f"""
+                SELECT @next_id = ISNULL(MAX(Id), 0) + 1 FROM {table};
+                IF @next_id > (SELECT CAST(current_value AS INT) FROM sys.sequences
+                               WHERE object_id = OBJECT_ID('{sequence_name}'))
+                BEGIN
+                    SET @restart = N'ALTER SEQUENCE {sequence_name} RESTART WITH '
+                        + CAST(@next_id AS NVARCHAR(11));
+                    EXEC sp_executesql @restart;
+                END;"""
+
+
+def _ensure_version_index_sql():
+    """Create IX_CustomerPO_DownloadDate on production, or drop Version from its key."""
+    table = REPORT_TABLES['header']
+    create_index = f"CREATE INDEX IX_CustomerPO_DownloadDate ON {table} (CustomerPO, DownloadDate)"
+    return f"""
+                IF INDEXPROPERTY(OBJECT_ID('{table}'), 'IX_CustomerPO_DownloadDate', 'IndexID') IS NULL
+                    {create_index};
+                ELSE IF EXISTS (
+                    SELECT 1 FROM sys.index_columns ic
+                    JOIN sys.indexes i ON i.object_id = ic.object_id AND i.index_id = ic.index_id
+                    WHERE i.object_id = OBJECT_ID('{table}')
+                      AND i.name = 'IX_CustomerPO_DownloadDate'
+                      AND COL_NAME(ic.object_id, ic.column_id) = 'Version'
+                )
+                    {create_index} WITH (DROP_EXISTING = ON);"""
+
+
+def upgrade_report_tables(db_connection):
+    """
+    SAFETY: Bring the production report tables onto sequence-assigned IDs in place.
+    Idempotent - creates missing sequences, rebuilds header/detail tables that still
+    use IDENTITY Ids (keeping every row and Id), creates the version lookup index,
+    and restarts each sequence above the highest existing Id. Run before incremental loads; reprocess-all builds
+    its tables from the same definitions.
+    """
+    logging.info("Checking report tables for sequence-assigned IDs")
+
+    tables = ", ".join(f"OBJECT_ID('{table}')" for table in REPORT_TABLES.values())
+
+    # The script manages its own transaction
+    original_autocommit = db_connection.autocommit
+    db_connection.autocommit = True
+
+    try:
+        execute_batch(db_connection, f"""
+            SET NOCOUNT ON;
+            SET XACT_ABORT ON;
+
+            DECLARE @next_id INT, @restart NVARCHAR(200), @drop_foreign_keys NVARCHAR(MAX) = N'';
+
+            BEGIN TRY
+                BEGIN TRANSACTION;
+
+                {_CREATE_SEQUENCES_SQL}
+
+                -- Report tables carry no foreign keys (see _REPORT_TABLE_DDL); legacy
+                -- ones would block the rebuild
+                IF COLUMNPROPERTY(OBJECT_ID('{REPORT_TABLES['header']}'), 'Id', 'IsIdentity') = 1
+                   OR COLUMNPROPERTY(OBJECT_ID('{REPORT_TABLES['detail']}'), 'Id', 'IsIdentity') = 1
+                BEGIN
+                    SELECT @drop_foreign_keys += N'ALTER TABLE '
+                        + QUOTENAME(OBJECT_SCHEMA_NAME(parent_object_id)) + N'.'
+                        + QUOTENAME(OBJECT_NAME(parent_object_id))
+                        + N' DROP CONSTRAINT ' + QUOTENAME(name) + N';'
+                    FROM sys.foreign_keys
+                    WHERE parent_object_id IN ({tables})
+                       OR referenced_object_id IN ({tables});
+                    EXEC sp_executesql @drop_foreign_keys;
+                END;
+                {_rebuild_with_sequence_id_sql('header')}
+                {_rebuild_with_sequence_id_sql('detail')}
+
+                -- Version lookups seek (CustomerPO, DownloadDate); see get_next_version_number
+                {_ensure_version_index_sql()}
+
+                -- Client-assigned IDs must not collide with existing rows
+                {_restart_sequence_sql('header', 'EDI_Report_Header_Seq')}
+                {_restart_sequence_sql('detail', 'EDI_Report_Detail_Seq')}
+
+                COMMIT TRANSACTION;
+            END TRY
+            BEGIN CATCH
+                -- sp_rename errors don't trigger XACT_ABORT, so roll back explicitly
+                IF @@TRANCOUNT > 0
+                    ROLLBACK TRANSACTION;
+                THROW;
+            END CATCH;
+        """)
+
+        logging.info("Report tables use sequence-assigned IDs")
+
+    except Exception as e:
+        # SAFETY: Never leave the upgrade transaction open (e.g. after a client timeout)
+        try:
+            execute_batch(db_connection, "IF @@TRANCOUNT > 0 ROLLBACK TRANSACTION;")
+        except Exception:
+            pass
+        logging.error(f"Failed to upgrade report tables: {sanitize_error_message(e)}")
+        raise
+    finally:
+        db_connection.autocommit = original_autocommit
 
 
 def swap_to_staging_mode():
@@ -149,26 +330,19 @@ def swap_to_staging_mode():
     SAFETY: Configure the ETL to write to staging tables.
     Returns original table names for restoration.
     """
-    global _STAGING_MODE
-    _STAGING_MODE = True
+    global get_table_name
+    get_table_name = _staging_table_name
+    refresh_query_cache(resolve_table_names())
     logging.info("Switched to staging table mode")
     return True
 
 
 def reset_staging_mode():
     """
-    SAFETY: Reset staging mode flag back to production mode.
+    SAFETY: Reset table names back to production mode.
     Call this after reprocess-all completes (success or failure).
     """
-    global _STAGING_MODE
-    _STAGING_MODE = False
+    global get_table_name
+    get_table_name = _production_table_name
+    refresh_query_cache(resolve_table_names())
     logging.info("Reset to production table mode")
-
-
-def get_table_name(base_name):
-    """
-    SAFETY: Get the appropriate table name (staging or production).
-    """
-    if _STAGING_MODE:
-        return f"{base_name}_Staging"
-    return base_name
\ No newline at end of file
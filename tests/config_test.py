@@ -3,7 +3,10 @@ Test configuration - uses console logging instead of file logging.
 This allows unit tests to run without requiring C:\\EDI_Logs directory.
 """
 
+import atexit
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
 
 # Configure console logging for tests (no file requirement)
 logging.basicConfig(
@@ -16,8 +19,14 @@ logging.basicConfig(
 audit_logger = logging.getLogger('audit')
 audit_handler = logging.StreamHandler()
 audit_handler.setFormatter(logging.Formatter('%(asctime)s - AUDIT - %(message)s'))
-audit_logger.addHandler(audit_handler)
 audit_logger.setLevel(logging.INFO)
 
+# Audit records are written by a background thread, off the ETL path
+audit_queue = queue.SimpleQueue()
+audit_logger.addHandler(QueueHandler(audit_queue))
+audit_listener = QueueListener(audit_queue, audit_handler)
+audit_listener.start()
+atexit.register(audit_listener.stop)
+
 # Suppress audit logger propagation to avoid duplicate messages
 audit_logger.propagate = False
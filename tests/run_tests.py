@@ -13,22 +13,49 @@ sys.path.insert(0, parent_dir)
 sys.path.insert(0, os.path.dirname(__file__))
 import config_test
 
+from security import sanitize_error_message
 from test_transformers import test_edi_parsing, print_results
+from test_loading import run_loading_tests
 from sample_test_data import (
     SAMPLE_PREPACK_JSON,
     SAMPLE_BULK_JSON,
     SAMPLE_MINIMAL_JSON,
-    SAMPLE_INVALID_JSON
+    SAMPLE_INVALID_JSON,
+    SAMPLE_PREPACK_SDQ_JSON,
+    SAMPLE_BULK_SDQ_JSON
 )
 
+# (error message, expected sanitized message) - secrets must be fully redacted
+SANITIZE_CASES = [
+    ("Server=db01;Database=x", "ValueError: [REDACTED];Database=x"),
+    ("C:\\Users\\me\\f.txt not found", "ValueError: [REDACTED] not found"),
+    ("Server=C:\\SQL Data\\inst;Database=x", "ValueError: [REDACTED];Database=x"),
+    ("Password=C:\\a b;c", "ValueError: [REDACTED];c"),
+    ("Server=db1 C:\\dir\\x;secret", "ValueError: [REDACTED]"),
+]
+
+
+def run_sanitize_tests():
+    """Check error message redaction; returns (name, passed) pairs"""
+    results_summary = []
+    for message, expected in SANITIZE_CASES:
+        actual = sanitize_error_message(ValueError(message))
+        if actual != expected:
+            print(f"\n[ERROR] Sanitize {message!r}: expected {expected!r}, got {actual!r}")
+        results_summary.append((f"Sanitize {message!r}", actual == expected))
+    return results_summary
+
 
 def run_all_tests():
     """Run all sample tests"""
+    # (name, JSON, expected (detail rows, BOM component rows) or None to skip the check)
     samples = [
-        ("PREPACK Order", SAMPLE_PREPACK_JSON),
-        ("BULK Order", SAMPLE_BULK_JSON),
-        ("Minimal Order", SAMPLE_MINIMAL_JSON),
-        ("Invalid Order", SAMPLE_INVALID_JSON)
+        ("PREPACK Order", SAMPLE_PREPACK_JSON, None),
+        ("BULK Order", SAMPLE_BULK_JSON, None),
+        ("Minimal Order", SAMPLE_MINIMAL_JSON, None),
+        ("Invalid Order", SAMPLE_INVALID_JSON, None),
+        ("PREPACK Order with store allocations", SAMPLE_PREPACK_SDQ_JSON, (2, 4)),
+        ("BULK Order with 50 store allocations", SAMPLE_BULK_SDQ_JSON, (52, 0))
     ]
 
     print("\n" + "="*80)
@@ -37,7 +64,7 @@ def run_all_tests():
 
     results_summary = []
 
-    for name, json_data in samples:
+    for name, json_data, expected_rows in samples:
         print("\n" + "="*80)
         print(f"TEST: {name}")
         print("="*80)
@@ -45,13 +72,23 @@ def run_all_tests():
         try:
             results = test_edi_parsing(json_data)
             print_results(results)
-            results_summary.append((name, results.get('success', False)))
+            passed = results.get('success', False)
+            if passed and expected_rows is not None:
+                summary = results['summary']
+                actual_rows = (summary['total_detail_rows'], summary['total_bom_components'])
+                if actual_rows != expected_rows:
+                    print(f"\n[ERROR] Expected (details, BOM components) {expected_rows}, got {actual_rows}")
+                    passed = False
+            results_summary.append((name, passed))
         except Exception as e:
             print(f"\n[ERROR] UNEXPECTED ERROR: {str(e)}")
             results_summary.append((name, False))
 
         print("\n" + "-"*80)
 
+    results_summary.extend(run_sanitize_tests())
+    results_summary.extend(run_loading_tests())
+
     # Print summary
     print("\n" + "="*80)
     print("TEST SUMMARY")
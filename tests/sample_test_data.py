@@ -3,6 +3,7 @@ Sample JSON test data for EDI parsing tests.
 Contains examples of both PREPACK and BULK orders.
 """
 
+import json
 import sys
 import os
 
@@ -14,8 +15,10 @@ sys.path.insert(0, parent_dir)
 sys.path.insert(0, os.path.dirname(__file__))
 import config_test  # Import test config first to set up logging
 
+# Samples are bytes, as read from a file in binary mode; json.loads accepts either
+
 # Sample PREPACK order (with BOM components)
-SAMPLE_PREPACK_JSON = """{
+SAMPLE_PREPACK_JSON = b"""{
   "PurchaseOrderHeader": {
     "PurchaseOrderNumber": "15826580",
     "CompanyCode": "KOHLS",
@@ -101,7 +104,7 @@ SAMPLE_PREPACK_JSON = """{
 }"""
 
 # Sample BULK order (no BOM components)
-SAMPLE_BULK_JSON = """{
+SAMPLE_BULK_JSON = b"""{
   "PurchaseOrderHeader": {
     "PurchaseOrderNumber": "PO-2024-5678",
     "CompanyCode": "AMAZON",
@@ -153,7 +156,7 @@ SAMPLE_BULK_JSON = """{
 }"""
 
 # Minimal valid JSON
-SAMPLE_MINIMAL_JSON = """{
+SAMPLE_MINIMAL_JSON = b"""{
   "PurchaseOrderHeader": {
     "PurchaseOrderNumber": "MIN-001",
     "CompanyCode": "TEST",
@@ -169,7 +172,7 @@ SAMPLE_MINIMAL_JSON = """{
 }"""
 
 # Invalid JSON (missing required fields)
-SAMPLE_INVALID_JSON = """{
+SAMPLE_INVALID_JSON = b"""{
   "PurchaseOrderHeader": {
     "PurchaseOrderNumber": "INVALID-001",
     "PurchaseOrder": {
@@ -178,6 +181,113 @@ SAMPLE_INVALID_JSON = """{
   }
 }"""
 
+# Sample PREPACK order allocated to stores (SDQ segment); the 0-qty store is skipped
+SAMPLE_PREPACK_SDQ_JSON = b"""{
+  "PurchaseOrderHeader": {
+    "PurchaseOrderNumber": "15826581",
+    "CompanyCode": "KOHLS",
+    "OrderDate": "20240115",
+    "PurchaseOrder": {
+      "RequestedShipDate": "20240201",
+      "CancelDate": "20240215",
+      "DepartmentNumber": "DEPT-123",
+      "ReferencePOType": "PREPACK",
+      "PurchaseOrderDetails": [
+        {
+          "VendorItemNumber": "STYLE-ABC",
+          "GTIN": "00012345678905",
+          "BuyerPartNumber": "SKU-001",
+          "UOMTypeCode": "EA",
+          "UnitPrice": 25.50,
+          "PackSize": 4,
+          "Pack": 2,
+          "DestinationInfo": {
+            "SDQ": {
+              "SDQ01": "EA",
+              "SDQ02": "92",
+              "SDQ03": "0101",
+              "SDQ04": "6",
+              "SDQ05": "0102",
+              "SDQ06": "0",
+              "SDQ07": "0103",
+              "SDQ08": "2"
+            }
+          },
+          "BOMDetails": [
+            {
+              "ColorDescription": "Navy Blue",
+              "SizeDescription": "S",
+              "GTIN": "00012345678901",
+              "Quantity": 1,
+              "UnitPrice": 25.50,
+              "RetailPrice": 49.99
+            },
+            {
+              "ColorDescription": "Navy Blue",
+              "SizeDescription": "M",
+              "GTIN": "00012345678902",
+              "Quantity": 3,
+              "UnitPrice": 25.50,
+              "RetailPrice": 49.99
+            }
+          ]
+        }
+      ]
+    }
+  }
+}"""
+
+
+def _sdq_segment(store_count: int) -> dict:
+    """SDQ segment allocating store_count stores as SDQ03/SDQ04, SDQ05/SDQ06, ..."""
+    sdq = {'SDQ01': 'EA', 'SDQ02': '92'}
+    for index in range(store_count):
+        sdq[f'SDQ{3 + 2 * index:02d}'] = f'{1000 + index}'
+        sdq[f'SDQ{4 + 2 * index:02d}'] = str(index % 5 + 1)
+    return sdq
+
+
+# Sample BULK order allocated to 50 stores, so the SDQ pairs run past SDQ99
+# (SDQ99/SDQ100 and SDQ101/SDQ102)
+SAMPLE_BULK_SDQ_JSON = json.dumps({
+    'PurchaseOrderHeader': {
+        'PurchaseOrderNumber': 'PO-2024-5679',
+        'CompanyCode': 'AMAZON',
+        'OrderDate': '20240120',
+        'PurchaseOrder': {
+            'RequestedShipDate': '20240205',
+            'CancelDate': '20240220',
+            'DepartmentNumber': 'DEPT-456',
+            'PurchaseOrderDetails': [
+                {
+                    'VendorItemNumber': 'WIDGET-100',
+                    'ColorDescription': 'Red',
+                    'SizeDescription': 'One Size',
+                    'GTIN': '00055555555501',
+                    'BuyerPartNumber': 'AMZ-WIDGET-100',
+                    'UOMTypeCode': 'EA',
+                    'UnitPrice': 12.99,
+                    'RetailPrice': 24.99,
+                    'PackSize': 12,
+                    'DestinationInfo': {'SDQ': _sdq_segment(50)}
+                },
+                {
+                    'VendorItemNumber': 'WIDGET-200',
+                    'ColorDescription': 'Blue',
+                    'SizeDescription': 'Large',
+                    'GTIN': '00055555555502',
+                    'BuyerPartNumber': 'AMZ-WIDGET-200',
+                    'UOMTypeCode': 'EA',
+                    'UnitPrice': 15.50,
+                    'RetailPrice': 29.99,
+                    'PackSize': 6,
+                    'DestinationInfo': {'SDQ': _sdq_segment(2)}
+                }
+            ]
+        }
+    }
+}).encode()
+
 
 def run_all_samples():
     """Run tests on all sample data"""
@@ -187,7 +297,9 @@ def run_all_samples():
         ("PREPACK Order", SAMPLE_PREPACK_JSON),
         ("BULK Order", SAMPLE_BULK_JSON),
         ("Minimal Order", SAMPLE_MINIMAL_JSON),
-        ("Invalid Order", SAMPLE_INVALID_JSON)
+        ("Invalid Order", SAMPLE_INVALID_JSON),
+        ("PREPACK Order with store allocations", SAMPLE_PREPACK_SDQ_JSON),
+        ("BULK Order with 50 store allocations", SAMPLE_BULK_SDQ_JSON)
     ]
 
     for name, json_data in samples:
@@ -207,6 +319,8 @@ if __name__ == "__main__":
     print("  SAMPLE_BULK_JSON     - BULK order with line items")
     print("  SAMPLE_MINIMAL_JSON  - Minimal valid order")
     print("  SAMPLE_INVALID_JSON  - Invalid order (for error testing)")
+    print("  SAMPLE_PREPACK_SDQ_JSON - PREPACK order with store allocations")
+    print("  SAMPLE_BULK_SDQ_JSON    - BULK order with 50 store allocations (past SDQ99)")
     print("\nUsage:")
     print("  from test_transformers import test_edi_parsing, print_results")
     print("  from sample_test_data import SAMPLE_PREPACK_JSON")
@@ -0,0 +1,342 @@
+"""
+Loader tests against fake database connections.
+Covers the ETL plumbing (threading, status batching, buffering, ID blocks,
+pooling) without requiring a SQL Server instance.
+"""
+
+import re
+import sys
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from functools import partial
+
+# Add parent directory to path to import core modules
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parent_dir)
+
+# Use test configuration (console logging only, no file requirement)
+sys.path.insert(0, os.path.dirname(__file__))
+import config_test  # Import test config first to set up logging
+
+# etl_processor reads audit_logger from config
+sys.modules.setdefault('config', config_test)
+
+import etl_processor
+from database import ConnectionPool, IdAllocator, ReportRowBuffer
+from sample_test_data import SAMPLE_MINIMAL_JSON, SAMPLE_INVALID_JSON, SAMPLE_PREPACK_SDQ_JSON
+
+
+INBOUND_COLUMNS = ['Id', 'DownloadDate', 'CompanyCode', 'Channel', 'TransactionType',
+                   'JSONContent', 'ReportingProcessStatus', 'ReportingProcessed', 'CustomerPO']
+
+_TABLE_RE = re.compile(r'^(?:INSERT INTO|UPDATE) (\w+)')
+
+
+def _inbound_record(source_id: int, json_content, customer_po: str = 'PO-1', version: int = 1) -> dict:
+    """Build one EDIGatewayInbound row as returned by the loader's source query"""
+    return {
+        'Id': source_id,
+        'DownloadDate': datetime(2024, 3, 1, 0, source_id % 60),
+        'CompanyCode': 'K',
+        'Channel': 'EDI',
+        'TransactionType': '850',
+        'JSONContent': json_content,
+        'ReportingProcessStatus': None,
+        'ReportingProcessed': None,
+        'CustomerPO': customer_po,
+        'Version': version,
+    }
+
+
+class FakeDatabase:
+    """
+    Server state shared by FakeConnections: a log of (event, table, payload, autocommit)
+    tuples, sequence counters and the EDIGatewayInbound rows to serve.
+    """
+
+    def __init__(self, inbound=(), slow_sources=(), failing_status_updates: int = 0):
+        self.inbound = list(inbound)
+        self.slow_sources = set(slow_sources)
+        self.failing_status_updates = failing_status_updates
+        self.sequences = {}
+        self.log = []
+        self.lock = threading.Lock()
+        self.connections_opened = 0
+
+    def record(self, event: str, table=None, payload=None, autocommit=None):
+        with self.lock:
+            self.log.append((event, table, payload, autocommit))
+
+    def events(self, event: str, table_prefix: str = ''):
+        with self.lock:
+            return [entry for entry in self.log
+                    if entry[0] == event and (entry[1] or '').startswith(table_prefix)]
+
+    def connect(self):
+        with self.lock:
+            self.connections_opened += 1
+        return FakeConnection(self)
+
+
+class FakeCursor:
+    """Cursor answering the handful of statements the loader sends"""
+
+    def __init__(self, connection):
+        self._connection = connection
+        self._db = connection.db
+        self._rows = []
+        self.description = None
+        self.fast_executemany = False
+
+    def execute(self, query, params=None):
+        sql = ' '.join(query.split())
+        params = list(params or [])
+        self.description = None
+        self._rows = []
+
+        if 'sp_sequence_get_range' in sql:
+            name, count = params
+            with self._db.lock:
+                first = self._db.sequences.get(name, 1)
+                self._db.sequences[name] = first + count
+            self._db.record('reserve', name, count)
+            self.description = [('FirstId',)]
+            self._rows = [(first,)]
+        elif 'FROM EDIGatewayInbound' in sql and sql.startswith('WITH Inbound'):
+            # Reprocess-all also ranks versions server-side
+            columns = INBOUND_COLUMNS + ['Version'] if 'AS Version' in sql else INBOUND_COLUMNS
+            self.description = [(column,) for column in columns]
+            self._rows = [tuple(row[column] for column in columns) for row in self._db.inbound]
+        elif 'NextVersion' in sql:
+            self.description = [('NextVersion',)]
+            self._rows = [(1,)]
+        elif sql == 'SELECT 1':
+            self.description = [('',)]
+            self._rows = [(1,)]
+        else:
+            match = _TABLE_RE.match(sql)
+            table = match.group(1) if match else sql.split(' ', 1)[0]
+            if table.startswith('EDI_Report_Header'):
+                # Source table ID is the last insert_header parameter
+                if params[-1] in self._db.slow_sources:
+                    time.sleep(0.2)
+            self._db.record('execute', table, params, self._connection.autocommit)
+
+    def executemany(self, query, rows):
+        sql = ' '.join(query.split())
+        table = _TABLE_RE.match(sql).group(1)
+        if table == 'EDIGatewayInbound':
+            with self._db.lock:
+                fail = self._db.failing_status_updates > 0
+                self._db.failing_status_updates -= fail
+            if fail:
+                raise RuntimeError("Status update failed")
+        self._db.record('executemany', table, list(rows), self._connection.autocommit)
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchmany(self, size):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def nextset(self):
+        return False
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """pyodbc-like connection logging commits and rollbacks to its FakeDatabase"""
+
+    def __init__(self, db: FakeDatabase):
+        self.db = db
+        self.autocommit = True
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.db.record('commit')
+
+    def rollback(self):
+        self.db.record('rollback')
+
+    def close(self):
+        pass
+
+
+def _loaded_source_ids(db: FakeDatabase, table_prefix: str = 'EDI_Report_Header') -> list:
+    """Source table IDs of the header rows written, in write order"""
+    source_ids = [params[-1] for _, _, params, _ in db.events('execute', table_prefix)]
+    for _, _, rows, _ in db.events('executemany', table_prefix):
+        source_ids.extend(row[-1] for row in rows)
+    return source_ids
+
+
+def _status_batches(db: FakeDatabase) -> list:
+    """(status, error_message, source_id) batches written to EDIGatewayInbound"""
+    return [rows for _, _, rows, _ in db.events('executemany', 'EDIGatewayInbound')]
+
+
+def test_parallel_loads_keep_po_order():
+    """Records for one CustomerPO load in source order even when an earlier one is slow"""
+    records = [
+        _inbound_record(1, SAMPLE_MINIMAL_JSON, 'PO-A'),
+        _inbound_record(2, SAMPLE_MINIMAL_JSON, 'PO-B'),
+        _inbound_record(3, SAMPLE_MINIMAL_JSON, 'PO-A'),
+        _inbound_record(4, SAMPLE_MINIMAL_JSON, 'PO-B'),
+    ]
+    db = FakeDatabase(slow_sources={1})
+    pool = ConnectionPool(db.connect, min_size=0, max_size=4)
+
+    loaded = list(etl_processor._load_records_parallel(iter(records), pool, False, 4, deque()))
+
+    assert [record['Id'] for record, _ in loaded] == [1, 2, 3, 4], "results not in source order"
+    assert all(future.exception() is None for _, future in loaded), "a load failed"
+    written = _loaded_source_ids(db)
+    assert written.index(1) < written.index(3), f"PO-A loaded out of order: {written}"
+    assert written.index(2) < written.index(1), f"PO-B waited on PO-A: {written}"
+
+
+def test_abort_records_unclaimed_statuses():
+    """Records loaded by workers get a status even when the run stops early"""
+    records = [_inbound_record(100 + i, SAMPLE_MINIMAL_JSON, f'PO-{i}') for i in range(30)]
+    source_db = FakeDatabase(inbound=records, failing_status_updates=1)
+    target_db = FakeDatabase()
+    pool = ConnectionPool(target_db.connect, min_size=0, max_size=4)
+
+    original_interval = etl_processor.STATUS_FLUSH_INTERVAL
+    etl_processor.STATUS_FLUSH_INTERVAL = 3
+    try:
+        etl_processor.process_edi_transmissions(
+            source_db.connect(), target_db.connect(), target_pool=pool, max_workers=4
+        )
+        raise AssertionError("run did not stop on the failed status update")
+    except RuntimeError:
+        pass
+    finally:
+        etl_processor.STATUS_FLUSH_INTERVAL = original_interval
+
+    loaded = set(_loaded_source_ids(target_db))
+    marked = {source_id for batch in _status_batches(source_db) for _, _, source_id in batch}
+    assert loaded, "nothing was loaded before the abort"
+    assert loaded <= marked, f"loaded but unmarked: {sorted(loaded - marked)}"
+
+
+def test_status_updates_batched():
+    """Incremental statuses go to the source in STATUS_FLUSH_INTERVAL-sized batches"""
+    records = [_inbound_record(i, SAMPLE_MINIMAL_JSON, f'PO-{i}') for i in range(1, 8)]
+    records[4]['JSONContent'] = SAMPLE_INVALID_JSON
+    source_db = FakeDatabase(inbound=records)
+    target_db = FakeDatabase()
+
+    original_interval = etl_processor.STATUS_FLUSH_INTERVAL
+    etl_processor.STATUS_FLUSH_INTERVAL = 3
+    try:
+        result = etl_processor.process_edi_transmissions(source_db.connect(), target_db.connect())
+    finally:
+        etl_processor.STATUS_FLUSH_INTERVAL = original_interval
+
+    assert result == (6, 1), f"expected (6, 1), got {result}"
+    batches = _status_batches(source_db)
+    assert [len(batch) for batch in batches] == [3, 3, 1], f"batch sizes {[len(b) for b in batches]}"
+    statuses = [(status, source_id) for batch in batches for status, _, source_id in batch]
+    expected = [('Failed' if i == 5 else 'Success', i) for i in range(1, 8)]
+    assert statuses == expected, f"statuses {statuses}"
+
+
+def test_row_buffer_flush_and_commit_order():
+    """Reprocess-all flushes full buffers parents-first and commits after each flush"""
+    records = [_inbound_record(i, SAMPLE_PREPACK_SDQ_JSON, f'PO-{i}') for i in range(1, 6)]
+    source_db = FakeDatabase(inbound=records)
+    target_db = FakeDatabase()
+
+    # 1 header + 2 details + 4 BOM components per record: full after every second record
+    original_buffer = etl_processor.ReportRowBuffer
+    etl_processor.ReportRowBuffer = partial(ReportRowBuffer, flush_rows=10)
+    try:
+        etl_processor.process_edi_transmissions(source_db.connect(), target_db.connect(),
+                                                reprocess_all=True)
+    finally:
+        etl_processor.ReportRowBuffer = original_buffer
+
+    with target_db.lock:
+        writes = [(event, table) for event, table, _, _ in target_db.log
+                  if event == 'commit' or (event == 'executemany' and table.endswith('_Staging'))]
+    flush = [
+        ('executemany', 'EDI_Report_Header_Staging'),
+        ('executemany', 'EDI_Report_Detail_Staging'),
+        ('executemany', 'EDI_Report_BOM_Component_Staging'),
+        ('commit', None),
+    ]
+    assert writes == flush * 3, f"unexpected write order {writes}"
+    assert all(not autocommit for _, table, _, autocommit in target_db.events('executemany', 'EDI_Report')), \
+        "staging rows written outside a transaction"
+    assert sorted(_loaded_source_ids(target_db)) == [1, 2, 3, 4, 5], "missing header rows"
+
+
+def test_id_allocator_reserves_blocks():
+    """IDs come from one sequence round-trip per block, larger requests get their own"""
+    db = FakeDatabase()
+    connection = db.connect()
+    allocator = IdAllocator('Test_Seq', block_size=5)
+
+    taken = [list(allocator.take(count, connection)) for count in (3, 2, 1, 7)]
+
+    assert taken == [[1, 2, 3], [4, 5], [6], list(range(11, 18))], f"IDs {taken}"
+    assert [count for _, _, count, _ in db.events('reserve')] == [5, 5, 7], "unexpected reservations"
+
+
+def test_pool_returns_connection_on_exception():
+    """A connection borrowed by a failing block goes back to the pool"""
+    db = FakeDatabase()
+    pool = ConnectionPool(db.connect, min_size=0, max_size=1)
+
+    try:
+        with pool.acquire() as first:
+            raise ValueError("load failed")
+    except ValueError:
+        pass
+
+    with pool.acquire(timeout=0.1) as second:
+        assert second is first, "pool handed out a different connection"
+    assert db.connections_opened == 1, f"opened {db.connections_opened} connections"
+
+
+LOADING_TESTS = [
+    ("Parallel loads keep per-PO order", test_parallel_loads_keep_po_order),
+    ("Early abort records unclaimed statuses", test_abort_records_unclaimed_statuses),
+    ("Status updates are batched", test_status_updates_batched),
+    ("Row buffer flush and commit order", test_row_buffer_flush_and_commit_order),
+    ("IdAllocator reserves blocks", test_id_allocator_reserves_blocks),
+    ("Connection pool returns connection on exception", test_pool_returns_connection_on_exception),
+]
+
+
+def run_loading_tests():
+    """Run the loader tests; returns (name, passed) pairs"""
+    results_summary = []
+    for name, test in LOADING_TESTS:
+        try:
+            test()
+            passed = True
+        except Exception as e:
+            print(f"\n[ERROR] {name}: {type(e).__name__}: {e}")
+            passed = False
+        results_summary.append((name, passed))
+    return results_summary
+
+
+if __name__ == "__main__":
+    for name, passed in run_loading_tests():
+        status = "[PASS]" if passed else "[FAIL]"
+        print(f"{status:8s} - {name}")
@@ -25,18 +25,22 @@ def main():
     print("When finished, type END on a new line and press Enter.\n")
     print("-"*80)
 
-    # Read multi-line input until "END" is encountered
-    lines = []
-    while True:
-        try:
-            line = input()
-            if line.strip().upper() == 'END':
+    if not sys.stdin.isatty():
+        # Piped or redirected input (e.g. python test_single.py < order.json): read it all at once
+        json_input = sys.stdin.read()
+    else:
+        # Read multi-line input until "END" is encountered
+        lines = []
+        while True:
+            try:
+                line = input()
+                if line.strip().upper() == 'END':
+                    break
+                lines.append(line)
+            except EOFError:
                 break
-            lines.append(line)
-        except EOFError:
-            break
 
-    json_input = '\n'.join(lines)
+        json_input = '\n'.join(lines)
 
     if not json_input.strip():
         print("\n[ERROR] No JSON provided.")
@@ -64,23 +68,18 @@ def main():
 
             filename = f"test_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
             with open(filename, 'w') as f:
-                # Convert datetime objects to strings for JSON serialization
                 output = {
                     'success': results['success'],
                     'order_type': results['order_type'],
                     'customer_po': results['customer_po'],
                     'version': results['version'],
-                    'header': {k: str(v) if not isinstance(v, (str, int, float, bool, type(None))) else v
-                              for k, v in results['header'].items()},
-                    'details': [{k: str(v) if not isinstance(v, (str, int, float, bool, type(None))) else v
-                                for k, v in detail.items()}
-                               for detail in results['details']],
-                    'bom_components': [{k: str(v) if not isinstance(v, (str, int, float, bool, type(None))) else v
-                                       for k, v in comp.items()}
-                                      for comp in results['bom_components']],
+                    'header': results['header'],
+                    'details': results['details'],
+                    'bom_components': results['bom_components'],
                     'summary': results['summary']
                 }
-                json.dump(output, f, indent=2)
+                # Convert datetime objects to strings for JSON serialization
+                json.dump(output, f, indent=2, default=str)
             print(f"\nResults saved to: {filename}")
 
 
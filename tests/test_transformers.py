@@ -3,12 +3,20 @@ Unit tests for EDI transformation logic.
 Tests parsing functions without requiring database connection.
 """
 
+import bisect
 import json
 from datetime import datetime
-from typing import List, Dict, Any
+from operator import itemgetter
+from typing import List, Dict, Any, Union
 import sys
 import os
 
+try:
+    # PERFORMANCE: Native JSON parser; raises a json.JSONDecodeError subclass
+    import orjson as _json
+except ImportError:
+    _json = json
+
 # Add parent directory to path to import core modules
 parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, parent_dir)
@@ -17,102 +25,134 @@ sys.path.insert(0, parent_dir)
 sys.path.insert(0, os.path.dirname(__file__))
 import config_test  # Import test config first to set up logging
 
+from database import ReportRows
+from security import validate_json_structure
+from transformers import detect_order_type, build_prepack_rows, build_bulk_rows
+
+
+def _rows(columns: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """Build row dicts from column lists"""
+    keys = list(columns)
+    return [dict(zip(keys, values)) for values in zip(*columns.values())]
+
 
 class MockDatabase:
-    """Mock database for testing - stores data in memory instead of SQL Server"""
+    """
+    Mock database for testing - stores data in memory instead of SQL Server.
+    PERFORMANCE: Tables are stored column-wise (one list per column); row dicts
+    are only built when a table is read.
+    """
+
+    HEADER_COLUMNS = ('Id', 'customer_po', 'company', 'order_date', 'start_date', 'complete_date',
+                      'department', 'download_date', 'po_type', 'version', 'source_table_id')
+    DETAIL_COLUMNS = ('Id', 'header_id', 'style', 'color', 'size', 'qty', 'upc', 'sku', 'uom',
+                      'unit_price', 'retail_price', 'inner_pack', 'qty_per_inner_pack', 'dc',
+                      'store_number', 'is_bom')
+    BOM_COLUMNS = ('Id', 'detail_id', 'component_sku', 'component_size', 'component_qty',
+                   'component_unit_price', 'component_retail_price')
 
     def __init__(self):
-        self.headers: List[Dict[str, Any]] = []
-        self.details: List[Dict[str, Any]] = []
-        self.bom_components: List[Dict[str, Any]] = []
+        self.header_cols: Dict[str, List[Any]] = {column: [] for column in self.HEADER_COLUMNS}
+        self.detail_cols: Dict[str, List[Any]] = {column: [] for column in self.DETAIL_COLUMNS}
+        self.bom_cols: Dict[str, List[Any]] = {column: [] for column in self.BOM_COLUMNS}
         self.next_id = 1
+        # Sorted download dates per PO, for version lookups
+        self._po_dates: Dict[str, List[datetime]] = {}
+
+    @staticmethod
+    def _append_row(columns: Dict[str, List[Any]], row: tuple):
+        """Append a row given in column order"""
+        for column, value in zip(columns.values(), row):
+            column.append(value)
 
-    def insert_header(self, **kwargs) -> int:
+    @property
+    def headers(self) -> List[Dict[str, Any]]:
+        return _rows(self.header_cols)
+
+    @property
+    def details(self) -> List[Dict[str, Any]]:
+        return _rows(self.detail_cols)
+
+    @property
+    def bom_components(self) -> List[Dict[str, Any]]:
+        return _rows(self.bom_cols)
+
+    def insert_header(self, customer_po, company, order_date, start_date, complete_date,
+                      department, download_date, po_type, version, source_table_id) -> int:
         """Simulate header insert and return ID"""
         header_id = self.next_id
         self.next_id += 1
-        header = {'Id': header_id, **kwargs}
-        self.headers.append(header)
+        self._append_row(self.header_cols, (
+            header_id, customer_po, company, order_date, start_date, complete_date,
+            department, download_date, po_type, version, source_table_id
+        ))
+        bisect.insort(self._po_dates.setdefault(customer_po, []), download_date)
         return header_id
 
-    def insert_detail(self, **kwargs) -> int:
+    def insert_detail(self, header_id, style, color, size, qty, upc, sku, uom, unit_price,
+                      retail_price, inner_pack, qty_per_inner_pack, dc, store_number,
+                      is_bom) -> int:
         """Simulate detail insert and return ID"""
         detail_id = self.next_id
         self.next_id += 1
-        detail = {'Id': detail_id, **kwargs}
-        self.details.append(detail)
+        self._append_row(self.detail_cols, (
+            detail_id, header_id, style, color, size, qty, upc, sku, uom, unit_price,
+            retail_price, inner_pack, qty_per_inner_pack, dc, store_number, is_bom
+        ))
         return detail_id
 
-    def insert_bom_component(self, **kwargs) -> None:
+    def insert_bom_component(self, detail_id, component_sku, component_size, component_qty,
+                             component_unit_price, component_retail_price) -> None:
         """Simulate BOM component insert"""
         component_id = self.next_id
         self.next_id += 1
-        component = {'Id': component_id, **kwargs}
-        self.bom_components.append(component)
+        self._append_row(self.bom_cols, (
+            component_id, detail_id, component_sku, component_size, component_qty,
+            component_unit_price, component_retail_price
+        ))
+
+    def write_report_rows(self, rows: ReportRows) -> int:
+        """Store one record's rows, like database.write_report_rows; returns the header ID"""
+        header_id = self.insert_header(*rows.header)
+        detail_components = rows.detail_components or [()] * len(rows.details)
+        for detail, components in zip(rows.details, detail_components):
+            detail_id = self.insert_detail(header_id, *detail)
+            for component in components:
+                self.insert_bom_component(detail_id, *component)
+        return header_id
 
     def get_next_version_number(self, customer_po: str, download_date: datetime) -> int:
         """Calculate version number based on existing headers"""
-        count = sum(1 for h in self.headers
-                   if h.get('customer_po') == customer_po
-                   and h.get('download_date') < download_date)
-        return count + 1
+        return bisect.bisect_left(self._po_dates.get(customer_po, []), download_date) + 1
 
     def reset(self):
         """Clear all data"""
-        self.headers.clear()
-        self.details.clear()
-        self.bom_components.clear()
+        for column in self.header_cols.values():
+            column.clear()
+        for column in self.detail_cols.values():
+            column.clear()
+        for column in self.bom_cols.values():
+            column.clear()
+        self._po_dates.clear()
         self.next_id = 1
 
 
-def test_edi_parsing(json_input: str, source_table_id: int = 1,
+def test_edi_parsing(json_input: Union[str, bytes], source_table_id: int = 1,
                      download_date: datetime = None) -> Dict[str, Any]:
     """
     Test EDI parsing with JSON input and return structured output.
 
     Args:
-        json_input: JSON string of EDI data
+        json_input: JSON string (str or UTF-8 bytes) of EDI data
         source_table_id: Simulated source table ID
         download_date: Download date (defaults to now)
 
     Returns:
         Dictionary with parsed header, details, and BOM components
     """
-    from transformers import detect_order_type
-
-    # Import validate_json_structure directly to avoid config import issues
-    import logging
-
-    def validate_json_structure(edi_data: dict) -> None:
-        """Validate JSON structure before processing"""
-        if 'PurchaseOrderHeader' not in edi_data:
-            raise ValueError("Missing required field: PurchaseOrderHeader")
-
-        po_header = edi_data['PurchaseOrderHeader']
-        required_fields = ['PurchaseOrderNumber', 'CompanyCode', 'PurchaseOrder']
-        for field in required_fields:
-            if field not in po_header:
-                raise ValueError(f"Missing required field: PurchaseOrderHeader.{field}")
-
-        po_number = po_header['PurchaseOrderNumber']
-        if len(str(po_number)) > 50:
-            raise ValueError(f"PurchaseOrderNumber exceeds maximum length: {len(po_number)}")
-
-        po_details = po_header['PurchaseOrder']
-        if 'PurchaseOrderDetails' not in po_details:
-            raise ValueError("Missing required field: PurchaseOrder.PurchaseOrderDetails")
-
-        if not isinstance(po_details['PurchaseOrderDetails'], list):
-            raise ValueError("PurchaseOrderDetails must be an array")
-
-        if len(po_details['PurchaseOrderDetails']) > 10000:
-            raise ValueError(f"Excessive line items: {len(po_details['PurchaseOrderDetails'])}")
-
-        logging.debug(f"JSON validation passed for PO {po_number}")
-
     # Parse JSON
     try:
-        edi_data = json.loads(json_input)
+        edi_data = _json.loads(json_input)
     except json.JSONDecodeError as e:
         return {
             'error': f'Invalid JSON: {str(e)}',
@@ -144,24 +184,16 @@ def test_edi_parsing(json_input: str, source_table_id: int = 1,
     # Detect order type
     order_type = detect_order_type(edi_data)
 
-    # Process based on type (using modified functions that work with mock)
+    # Build rows with the production transformers and store them in the mock
+    build_rows = build_prepack_rows if order_type == 'PREPACK' else build_bulk_rows
     try:
-        if order_type == 'PREPACK':
-            process_prepack_with_mock(
-                edi_data=edi_data,
-                download_date=download_date,
-                source_table_id=source_table_id,
-                version=version,
-                mock_db=mock_db
-            )
-        else:
-            process_bulk_with_mock(
-                edi_data=edi_data,
-                download_date=download_date,
-                source_table_id=source_table_id,
-                version=version,
-                mock_db=mock_db
-            )
+        rows = build_rows(
+            edi_data=edi_data,
+            download_date=download_date,
+            source_table_id=source_table_id,
+            version=version
+        )
+        mock_db.write_report_rows(rows)
     except Exception as e:
         return {
             'error': f'Processing failed: {str(e)}',
@@ -169,203 +201,92 @@ def test_edi_parsing(json_input: str, source_table_id: int = 1,
         }
 
     # Return structured results
+    headers = mock_db.headers
+    details = mock_db.details
+    bom_components = mock_db.bom_components
     return {
         'success': True,
         'order_type': order_type,
         'customer_po': customer_po,
         'version': version,
-        'header': mock_db.headers[0] if mock_db.headers else None,
-        'details': mock_db.details,
-        'bom_components': mock_db.bom_components,
+        'header': headers[0] if headers else None,
+        'details': details,
+        'bom_components': bom_components,
         'summary': {
-            'total_detail_rows': len(mock_db.details),
-            'total_bom_components': len(mock_db.bom_components)
+            'total_detail_rows': len(details),
+            'total_bom_components': len(bom_components)
         }
     }
 
 
-def process_prepack_with_mock(edi_data, download_date, source_table_id, version, mock_db):
-    """Process PREPACK order using mock database"""
-    from data_validation import safe_parse_date, safe_int_conversion, safe_float_conversion, parse_store_allocations
-
-    po_header = edi_data['PurchaseOrderHeader']
-    po_details = po_header['PurchaseOrder']
-
-    # Insert header
-    header_id = mock_db.insert_header(
-        customer_po=po_header['PurchaseOrderNumber'],
-        company=po_header.get('CompanyCode'),
-        order_date=safe_parse_date(po_header.get('OrderDate')),
-        start_date=safe_parse_date(po_details.get('RequestedShipDate')),
-        complete_date=safe_parse_date(po_details.get('CancelDate')),
-        department=po_details.get('DepartmentNumber'),
-        download_date=download_date,
-        po_type='PREPACK',
-        version=version,
-        source_table_id=source_table_id
-    )
-
-    # Process each line item
-    for line_item in po_details.get('PurchaseOrderDetails', []):
-        # Get color from first BOM component
-        color = None
-        if line_item.get('BOMDetails') and len(line_item['BOMDetails']) > 0:
-            color = line_item['BOMDetails'][0].get('ColorDescription')
-
-        pack_size_val = line_item.get('PackSize')
-        inner_pack = safe_int_conversion(pack_size_val) if pack_size_val else None
-
-        pack_qty = line_item.get('Pack')
-        qty_per_inner_pack = safe_int_conversion(pack_qty) if pack_qty else None
-
-        # Parse store allocations from DestinationInfo
-        store_allocations = parse_store_allocations(line_item.get('DestinationInfo'))
-
-        # Insert one detail row per store allocation
-        for store_number, store_qty in store_allocations:
-            detail_id = mock_db.insert_detail(
-                header_id=header_id,
-                style=line_item.get('VendorItemNumber'),
-                color=color,
-                size=None,
-                qty=store_qty,
-                upc=line_item.get('GTIN'),
-                sku=line_item.get('BuyerPartNumber'),
-                uom=line_item.get('UOMTypeCode'),
-                unit_price=safe_float_conversion(line_item.get('UnitPrice', 0)),
-                retail_price=None,
-                inner_pack=inner_pack,
-                qty_per_inner_pack=qty_per_inner_pack,
-                dc=None,
-                store_number=store_number,
-                is_bom=True
-            )
-
-            # Insert BOM components for each detail row
-            for bom_component in line_item.get('BOMDetails', []):
-                mock_db.insert_bom_component(
-                    detail_id=detail_id,
-                    component_sku=bom_component.get('GTIN'),
-                    component_size=bom_component.get('SizeDescription'),
-                    component_qty=safe_int_conversion(bom_component.get('Quantity', 1)),
-                    component_unit_price=safe_float_conversion(bom_component.get('UnitPrice', 0)),
-                    component_retail_price=safe_float_conversion(bom_component.get('RetailPrice', 0))
-                )
-
-
-def process_bulk_with_mock(edi_data, download_date, source_table_id, version, mock_db):
-    """Process BULK order using mock database"""
-    from data_validation import safe_parse_date, safe_int_conversion, safe_float_conversion, parse_store_allocations
-
-    po_header = edi_data['PurchaseOrderHeader']
-    po_details = po_header['PurchaseOrder']
-
-    # Insert header
-    header_id = mock_db.insert_header(
-        customer_po=po_header['PurchaseOrderNumber'],
-        company=po_header.get('CompanyCode'),
-        order_date=safe_parse_date(po_header.get('OrderDate')),
-        start_date=safe_parse_date(po_details.get('RequestedShipDate')),
-        complete_date=safe_parse_date(po_details.get('CancelDate')),
-        department=po_details.get('DepartmentNumber'),
-        download_date=download_date,
-        po_type='BULK',
-        version=version,
-        source_table_id=source_table_id
-    )
-
-    # Process each line item
-    for line_item in po_details.get('PurchaseOrderDetails', []):
-        retail_price_val = line_item.get('RetailPrice')
-        retail_price = safe_float_conversion(retail_price_val) if retail_price_val else None
-
-        pack_size_val = line_item.get('PackSize')
-        inner_pack = safe_int_conversion(pack_size_val) if pack_size_val else None
-
-        pack_qty = line_item.get('Pack')
-        qty_per_inner_pack = safe_int_conversion(pack_qty) if pack_qty else None
-
-        # Parse store allocations from DestinationInfo
-        store_allocations = parse_store_allocations(line_item.get('DestinationInfo'))
-
-        # Insert one detail row per store allocation
-        for store_number, store_qty in store_allocations:
-            mock_db.insert_detail(
-                header_id=header_id,
-                style=line_item.get('VendorItemNumber'),
-                color=line_item.get('ColorDescription'),
-                size=line_item.get('SizeDescription'),
-                qty=store_qty,
-                upc=line_item.get('GTIN'),
-                sku=line_item.get('BuyerPartNumber'),
-                uom=line_item.get('UOMTypeCode'),
-                unit_price=safe_float_conversion(line_item.get('UnitPrice', 0)),
-                retail_price=retail_price,
-                inner_pack=inner_pack,
-                qty_per_inner_pack=qty_per_inner_pack,
-                dc=None,
-                store_number=store_number,
-                is_bom=False
-            )
-
-
 def print_results(results: Dict[str, Any]):
-    """Pretty print the parsing results in table format"""
+    """
+    Pretty print the parsing results in table format.
+    PERFORMANCE: Lines are collected and written to stdout in one call.
+    """
     if not results.get('success'):
-        print(f"\n[ERROR] {results.get('error')}")
+        sys.stdout.write(f"\n[ERROR] {results.get('error')}\n")
         return
 
-    print(f"\n[SUCCESS] - Parsed {results['order_type']} order")
-    print(f"PO Number: {results['customer_po']}")
-    print(f"Version: {results['version']}")
+    out = []
+    out.append(f"\n[SUCCESS] - Parsed {results['order_type']} order")
+    out.append(f"PO Number: {results['customer_po']}")
+    out.append(f"Version: {results['version']}")
 
     # Header table
-    print("\n" + "="*80)
-    print("HEADER")
-    print("="*80)
+    out.append("\n" + "="*80)
+    out.append("HEADER")
+    out.append("="*80)
     header = results['header']
     if header:
         for key, value in header.items():
             if key != 'Id':
-                print(f"{key:20s}: {value}")
+                out.append(f"{key:20s}: {value}")
 
     # Details table
-    print("\n" + "="*80)
-    print(f"DETAILS ({results['summary']['total_detail_rows']} rows)")
-    print("="*80)
+    out.append("\n" + "="*80)
+    out.append(f"DETAILS ({results['summary']['total_detail_rows']} rows)")
+    out.append("="*80)
 
     if results['details']:
         # Print header row
         keys = [k for k in results['details'][0].keys() if k not in ['Id', 'header_id']]
-        print(f"{'Row':<4} | " + " | ".join(f"{k:<15}" for k in keys))
-        print("-" * (6 + len(keys) * 18))
+        row_fmt = "{:<4} | " + " | ".join(["{:<15}"] * len(keys))
+        out.append(row_fmt.format('Row', *keys))
+        out.append("-" * (6 + len(keys) * 18))
 
         # Print data rows
+        # All rows share the same columns, so fetch them in one call per row
+        get_values = itemgetter(*keys)
         for idx, detail in enumerate(results['details'], 1):
-            values = [str(detail.get(k, ''))[:15] for k in keys]
-            print(f"{idx:<4} | " + " | ".join(f"{v:<15}" for v in values))
+            values = [str(v)[:15] for v in get_values(detail)]
+            out.append(row_fmt.format(idx, *values))
 
     # BOM components table (if any)
     if results['bom_components']:
-        print("\n" + "="*80)
-        print(f"BOM COMPONENTS ({results['summary']['total_bom_components']} rows)")
-        print("="*80)
+        out.append("\n" + "="*80)
+        out.append(f"BOM COMPONENTS ({results['summary']['total_bom_components']} rows)")
+        out.append("="*80)
 
         keys = [k for k in results['bom_components'][0].keys() if k not in ['Id', 'detail_id']]
-        print(f"{'Row':<4} | " + " | ".join(f"{k:<15}" for k in keys))
-        print("-" * (6 + len(keys) * 18))
+        row_fmt = "{:<4} | " + " | ".join(["{:<15}"] * len(keys))
+        out.append(row_fmt.format('Row', *keys))
+        out.append("-" * (6 + len(keys) * 18))
 
+        get_values = itemgetter(*keys)
         for idx, component in enumerate(results['bom_components'], 1):
-            values = [str(component.get(k, ''))[:15] for k in keys]
-            print(f"{idx:<4} | " + " | ".join(f"{v:<15}" for v in values))
+            values = [str(v)[:15] for v in get_values(component)]
+            out.append(row_fmt.format(idx, *values))
 
-    print("\n" + "="*80)
+    out.append("\n" + "="*80)
+    sys.stdout.write("\n".join(out) + "\n")
 
 
 def run_test_from_file(json_file_path: str):
     """Load JSON from file and test parsing"""
     try:
-        with open(json_file_path, 'r') as f:
+        # Read raw bytes - the parser decodes UTF-8 itself
+        with open(json_file_path, 'rb') as f:
             json_input = f.read()
 
         results = test_edi_parsing(json_input)
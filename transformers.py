@@ -1,106 +1,105 @@
 import logging
 from data_validation import safe_parse_date, safe_int_conversion, safe_float_conversion, parse_store_allocations
-from database import insert_header, insert_detail, insert_bom_component
+from database import ReportRows
 
 
-def process_prepack_order(edi_data, download_date, source_table_id, version, db_connection):
-    """
-    Process PREPACK orders with security validations. Made for 88 Kohls.
-    """
-    # 1. Extract header info
+def _build_header_row(edi_data, download_date, source_table_id, version, po_type):
+    """Build the EDI_Report_Header row with safe date parsing"""
     po_header = edi_data['PurchaseOrderHeader']
     po_details = po_header['PurchaseOrder']
 
-    # 2. Insert header with safe date parsing
-    header_id = insert_header(
-        customer_po=po_header['PurchaseOrderNumber'],
-        company=po_header.get('CompanyCode'),
-        order_date=safe_parse_date(po_header.get('OrderDate')),
-        start_date=safe_parse_date(po_details.get('RequestedShipDate')),
-        complete_date=safe_parse_date(po_details.get('CancelDate')),
-        department=po_details.get('DepartmentNumber'),
-        download_date=download_date,
-        po_type='PREPACK',
-        version=version,
-        source_table_id=source_table_id,
-        db_connection=db_connection
+    return (
+        po_header['PurchaseOrderNumber'],                   # CustomerPO
+        po_header.get('CompanyCode'),                       # Company
+        safe_parse_date(po_header.get('OrderDate')),        # OrderDate
+        safe_parse_date(po_details.get('RequestedShipDate')),  # StartDate
+        safe_parse_date(po_details.get('CancelDate')),      # CompleteDate
+        po_details.get('DepartmentNumber'),                 # Department
+        download_date,
+        po_type,
+        version,
+        source_table_id
     )
 
-    # 3. Process each PurchaseOrderDetail (each is one BOM type)
+
+def build_prepack_rows(edi_data, download_date, source_table_id, version):
+    """
+    Build reporting rows for a PREPACK order with security validations. Made for 88 Kohls.
+    """
+    # 1. Extract header info
+    po_details = edi_data['PurchaseOrderHeader']['PurchaseOrder']
+
+    # 2. Header row with safe date parsing
+    header = _build_header_row(edi_data, download_date, source_table_id, version, 'PREPACK')
+
+    # 3. One detail row per store allocation (each PurchaseOrderDetail is one BOM type)
+    detail_rows = []
+    detail_components = []
     for line_item in po_details.get('PurchaseOrderDetails', []):
         # Get color from FIRST BOM component (all components share same color)
         color = None
         if line_item.get('BOMDetails') and len(line_item['BOMDetails']) > 0:
             color = line_item['BOMDetails'][0].get('ColorDescription')
-# Begin edit:
+
         pack_size_val = line_item.get('PackSize')
         inner_pack = safe_int_conversion(pack_size_val) if pack_size_val else None
 
         pack_qty = line_item.get('Pack')
         qty_per_inner_pack = safe_int_conversion(pack_qty) if pack_qty else None
-# End edit
+
+        # PERFORMANCE: Converted once per line item, not once per store allocation
+        unit_price = safe_float_conversion(line_item.get('UnitPrice', 0))
+
+        # 4. BOM components are the same for every store allocation of this line item
+        components = [
+            (
+                bom_component.get('GTIN'),
+                bom_component.get('SizeDescription'),
+                safe_int_conversion(bom_component.get('Quantity', 1)),
+                safe_float_conversion(bom_component.get('UnitPrice', 0)),
+                safe_float_conversion(bom_component.get('RetailPrice', 0))
+            )
+            for bom_component in line_item.get('BOMDetails') or []
+        ]
+
         # Parse store allocations from DestinationInfo
         store_allocations = parse_store_allocations(line_item.get('DestinationInfo'))
 
-        # Insert one detail row per store allocation
         for store_number, store_qty in store_allocations:
             # SECURITY: Safe numeric conversions
-            detail_id = insert_detail(
-                header_id=header_id,
-                style=line_item.get('VendorItemNumber'),
-                color=color,
-                size=None,
-                qty=store_qty,
-                upc=line_item.get('GTIN'),
-                sku=line_item.get('BuyerPartNumber'),
-                uom=line_item.get('UOMTypeCode'),
-                unit_price=safe_float_conversion(line_item.get('UnitPrice', 0)),
-                retail_price=None,
-                inner_pack=inner_pack, # edit
-                qty_per_inner_pack=qty_per_inner_pack, # edit
-                dc=None,
-                store_number=store_number,
-                is_bom=True,
-                db_connection=db_connection
-            )
-
-            # 4. Insert BOM components for each detail row
-            for bom_component in line_item.get('BOMDetails', []):
-                insert_bom_component(
-                    detail_id=detail_id,
-                    component_sku=bom_component.get('GTIN'),
-                    component_size=bom_component.get('SizeDescription'),
-                    component_qty=safe_int_conversion(bom_component.get('Quantity', 1)),
-                    component_unit_price=safe_float_conversion(bom_component.get('UnitPrice', 0)),
-                    component_retail_price=safe_float_conversion(bom_component.get('RetailPrice', 0)),
-                    db_connection=db_connection
-                )
-
-
-def process_bulk_order(edi_data, download_date, source_table_id, version, db_connection):
+            detail_rows.append((
+                line_item.get('VendorItemNumber'),          # Style
+                color,
+                None,                                       # Size
+                store_qty,
+                line_item.get('GTIN'),                      # UPC
+                line_item.get('BuyerPartNumber'),           # SKU
+                line_item.get('UOMTypeCode'),               # UOM
+                unit_price,
+                None,                                       # RetailPrice
+                inner_pack,
+                qty_per_inner_pack,
+                None,                                       # DC
+                store_number,
+                True                                        # IsBOM
+            ))
+            detail_components.append(components)
+
+    return ReportRows(header, detail_rows, detail_components)
+
+
+def build_bulk_rows(edi_data, download_date, source_table_id, version):
     """
-    Process BULK orders with security validations. Made for 88 Kohls.
+    Build reporting rows for a BULK order with security validations. Made for 88 Kohls.
     """
     # 1. Extract header info
-    po_header = edi_data['PurchaseOrderHeader']
-    po_details = po_header['PurchaseOrder']
+    po_details = edi_data['PurchaseOrderHeader']['PurchaseOrder']
 
-    # 2. Insert header with safe date parsing
-    header_id = insert_header(
-        customer_po=po_header['PurchaseOrderNumber'],
-        company=po_header.get('CompanyCode'),
-        order_date=safe_parse_date(po_header.get('OrderDate')),
-        start_date=safe_parse_date(po_details.get('RequestedShipDate')),
-        complete_date=safe_parse_date(po_details.get('CancelDate')),
-        department=po_details.get('DepartmentNumber'),
-        download_date=download_date,
-        po_type='BULK',
-        version=version,
-        source_table_id=source_table_id,
-        db_connection=db_connection
-    )
+    # 2. Header row with safe date parsing
+    header = _build_header_row(edi_data, download_date, source_table_id, version, 'BULK')
 
-    # 3. Insert one detail row per store allocation
+    # 3. One detail row per store allocation
+    detail_rows = []
     for line_item in po_details.get('PurchaseOrderDetails', []):
         # SECURITY: Safe numeric conversions and null handling
         retail_price_val = line_item.get('RetailPrice')
@@ -112,29 +111,31 @@ def process_bulk_order(edi_data, download_date, source_table_id, version, db_con
         pack_qty = line_item.get('Pack')
         qty_per_inner_pack = safe_int_conversion(pack_qty) if pack_qty else None
 
+        # PERFORMANCE: Converted once per line item, not once per store allocation
+        unit_price = safe_float_conversion(line_item.get('UnitPrice', 0))
+
         # Parse store allocations from DestinationInfo
         store_allocations = parse_store_allocations(line_item.get('DestinationInfo'))
 
-        # Insert one detail row per store allocation
         for store_number, store_qty in store_allocations:
-            insert_detail(
-                header_id=header_id,
-                style=line_item.get('VendorItemNumber'),
-                color=line_item.get('ColorDescription'),
-                size=line_item.get('SizeDescription'),
-                qty=store_qty,
-                upc=line_item.get('GTIN'),
-                sku=line_item.get('BuyerPartNumber'),
-                uom=line_item.get('UOMTypeCode'),
-                unit_price=safe_float_conversion(line_item.get('UnitPrice', 0)),
-                retail_price=retail_price,
-                inner_pack=inner_pack,
-                qty_per_inner_pack=qty_per_inner_pack,
-                dc=None,
-                store_number=store_number,
-                is_bom=False,
-                db_connection=db_connection
-            )
+            detail_rows.append((
+                line_item.get('VendorItemNumber'),          # Style
+                line_item.get('ColorDescription'),          # Color
+                line_item.get('SizeDescription'),           # Size
+                store_qty,
+                line_item.get('GTIN'),                      # UPC
+                line_item.get('BuyerPartNumber'),           # SKU
+                line_item.get('UOMTypeCode'),               # UOM
+                unit_price,
+                retail_price,
+                inner_pack,
+                qty_per_inner_pack,
+                None,                                       # DC
+                store_number,
+                False                                       # IsBOM
+            ))
+
+    return ReportRows(header, detail_rows)
 
 
 def detect_order_type(edi_data):
@@ -148,8 +149,8 @@ def detect_order_type(edi_data):
             return 'PREPACK'
 
         # Or check for presence of BOM data in any line item
-        for detail in po_details.get('PurchaseOrderDetails', []):
-            if 'BOMDetails' in detail and detail['BOMDetails']:
-                return 'PREPACK'
+        # PERFORMANCE: One dict probe per line item, stops at the first match
+        if any(detail.get('BOMDetails') for detail in po_details.get('PurchaseOrderDetails', ())):
+            return 'PREPACK'
 
     return 'BULK'  # Default to BULK for all other type
\ No newline at end of file